@@ -4,29 +4,99 @@ All endpoints from https://api2.warera.io/docs/# with beautiful formatting
 """
 
 import os
+import sys
+import copy
 import json
+import time
+import signal
+import random
+import queue
+import logging
+import logging.handlers
+import hashlib
+import re
+from heapq import nlargest
+from operator import itemgetter
+from functools import lru_cache
+from itertools import islice
+from collections import deque, Counter, OrderedDict
 import asyncio
 import aiohttp
+import numpy as np
 import urllib.parse
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Sequence
 from datetime import datetime, timezone
 import discord
 from discord import app_commands
 from discord.ext import tasks, commands
 from discord.ui import View, Button, Modal, TextInput
-from dataclasses import dataclass, field
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used when missing
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # optional speedup; the default asyncio loop is used when missing
+    uvloop = None
 
 # ---------------- CONFIG ----------------
 API_BASE = os.getenv("WARERA_API_BASE", "https://api2.warera.io/trpc")
 DISCORD_TOKEN = os.getenv("DISCORD_BOT_TOKEN", "YOUR_TOKEN_HERE")
 DASH_CHANNEL_ID = os.getenv("WARERA_DASH_CHANNEL")
 ALERT_CHANNEL_ID = os.getenv("WARERA_ALERT_CHANNEL")
+DASH_CHANNEL_ID_INT = int(DASH_CHANNEL_ID) if DASH_CHANNEL_ID and DASH_CHANNEL_ID.isdigit() else None
+ALERT_CHANNEL_ID_INT = int(ALERT_CHANNEL_ID) if ALERT_CHANNEL_ID and ALERT_CHANNEL_ID.isdigit() else None
 STATE_PATH = os.getenv("WARERA_STATE_PATH", "state_warera.json")
+STATE_LOG_PATH = os.getenv("WARERA_STATE_LOG_PATH", STATE_PATH + ".log")
+STATE_LOG_MAX = int(os.getenv("WARERA_STATE_LOG_MAX", str(1024 * 1024)))
+STATE_FLUSH_DEBOUNCE = float(os.getenv("WARERA_STATE_FLUSH_DEBOUNCE", "0.5"))
 REQUEST_TIMEOUT = float(os.getenv("WARERA_REQUEST_TIMEOUT", "10"))
 RETRY_ATTEMPTS = int(os.getenv("WARERA_RETRY_ATTEMPTS", "3"))
 RETRY_BACKOFF = float(os.getenv("WARERA_RETRY_BACKOFF", "0.6"))
 DEFAULT_DASH_INTERVAL = int(os.getenv("WARERA_DASH_INTERVAL", "60"))
+# dash_loop follows battle activity unless an interval was set by hand: busy (many battles), active, idle
+DASH_ADAPTIVE = os.getenv("WARERA_DASH_ADAPTIVE", "1") != "0"
+DASH_INTERVAL_BUSY = int(os.getenv("WARERA_DASH_INTERVAL_BUSY", "10"))
+DASH_INTERVAL_ACTIVE = int(os.getenv("WARERA_DASH_INTERVAL_ACTIVE", "30"))
+DASH_INTERVAL_IDLE = int(os.getenv("WARERA_DASH_INTERVAL_IDLE", "120"))
+DASH_BUSY_BATTLES = int(os.getenv("WARERA_DASH_BUSY_BATTLES", "5"))
 PAGE_SIZE = int(os.getenv("WARERA_PAGE_SIZE", "8"))
+HTTP_POOL_LIMIT = int(os.getenv("WARERA_HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_PER_HOST = int(os.getenv("WARERA_HTTP_POOL_PER_HOST", "32"))
+HTTP_KEEPALIVE = float(os.getenv("WARERA_HTTP_KEEPALIVE", "75"))
+API_CACHE_TTL = float(os.getenv("WARERA_API_CACHE_TTL", str(max(2, DEFAULT_DASH_INTERVAL // 3))))
+API_CACHE_MAX = int(os.getenv("WARERA_API_CACHE_MAX", "2048"))
+# how many TTLs past expiry a cached response may still be served when a refetch fails
+API_STALE_FACTOR = float(os.getenv("WARERA_API_STALE_FACTOR", "10"))
+# per endpoint-prefix TTL overrides, "prefix=seconds" comma-separated
+API_CACHE_TTLS = {
+    pfx.strip(): float(ttl)
+    for pfx, ttl in (kv.split("=", 1) for kv in os.getenv("WARERA_API_CACHE_TTLS", "ranking.=15,battle.=5,country.getAllCountries=120,region.getRegionsObject=120,user.getUserLite=3600").split(",") if "=" in kv)
+}
+# outgoing request budget (requests/minute, 0 = unlimited) and how many may go out back to back
+API_RPM = float(os.getenv("WARERA_RPM", "0"))
+API_BURST = int(os.getenv("WARERA_RPM_BURST", "20"))
+USER_LOOKUP_CONCURRENCY = int(os.getenv("WARERA_USER_LOOKUP_CONCURRENCY", "20"))
+# most calls folded into one tRPC batch request (?batch=1); 1 sends every call on its own
+API_BATCH_MAX = int(os.getenv("WARERA_API_BATCH_MAX", "20"))
+
+# ---------------- LOGGING ----------------
+# records are queued on the event loop and written to stderr by a listener thread,
+# so a slow or piped stdout/journal never stalls the loop
+log = logging.getLogger("warera")
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-8s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S"))
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(q))
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(q, handler, respect_handler_level=True)
+    listener.start()
+    return listener
 
 # ---------------- URL MAP ----------------
 URLS = {
@@ -57,44 +127,232 @@ ICON_PREMIUM = "💎"
 ICON_REFERRAL = "🔗"
 ICON_GROUND = "🌾"
 
+# List endpoints whose entity type is fixed; anything else falls back to get_entity_icon
+ENDPOINT_ICON = {
+    "country.getAllCountries": ICON_COUNTRY,
+    "region.getRegionsObject": ICON_REGION,
+    "mu.getManyPaginated": ICON_MU,
+    "battle.getBattles": ICON_BATTLE,
+    "company.getCompanies": ICON_COMPANY,
+    "article.getArticlesPaginated": ICON_ARTICLE,
+}
+
 # ---------------- BOT SETUP ----------------
 intents = discord.Intents.default()
 intents.message_content = False
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+class WarEraBot(commands.Bot):
+    _shutdown: Optional[asyncio.Task] = None
+
+    async def setup_hook(self):
+        # discord.py only handles Ctrl+C itself; a worker being stopped gets SIGTERM
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._on_sigterm)
+        except (NotImplementedError, RuntimeError):
+            pass  # no loop signal handlers (e.g. Windows)
+
+    def _on_sigterm(self):
+        if self._shutdown is None:
+            log.info("👋 SIGTERM received, shutting down")
+            self._shutdown = asyncio.create_task(self.close())
+
+    async def close(self):
+        # reached on Ctrl+C (bot.run) and on SIGTERM (setup_hook's handler); persist state
+        # before the loop goes away
+        try:
+            await flush_state()
+        except Exception as e:
+            log.error("[close] state flush failed: %s", e)
+        await close_session()
+        await super().close()
+
+bot = WarEraBot(command_prefix="!", intents=intents, help_command=None)
 tree = bot.tree
 
+# ranking/list payloads are large JSON text; ask for a compressed body (aiohttp inflates it)
+HTTP_HEADERS = {"Accept": "application/json", "Accept-Encoding": "gzip, deflate", "User-Agent": "WarEra-Bot/1.0"}
+
 _session: Optional[aiohttp.ClientSession] = None
 async def get_session() -> aiohttp.ClientSession:
     global _session
     if _session is None or _session.closed:
-        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+        # one pooled connector for every war_api.call so TCP/TLS handshakes and DNS lookups are reused
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            ttl_dns_cache=300,
+            keepalive_timeout=HTTP_KEEPALIVE,
+            enable_cleanup_closed=True
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            headers=HTTP_HEADERS,
+            json_serialize=jdumps
+        )
     return _session
 
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+# ---------------- JSON ----------------
+def jdumpb(obj: Any, *, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, via orjson when available (non-JSON values become str)."""
+    if orjson is not None:
+        opt = orjson.OPT_NON_STR_KEYS
+        if indent:
+            opt |= orjson.OPT_INDENT_2
+        if sort_keys:
+            opt |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=str, option=opt)
+        except TypeError:
+            pass
+    return json.dumps(obj, default=str, indent=2 if indent else None, sort_keys=sort_keys,
+                      separators=None if indent else (",", ":"), ensure_ascii=False).encode("utf-8")
+
+def jdumps(obj: Any, *, indent: bool = False, sort_keys: bool = False) -> str:
+    return jdumpb(obj, indent=indent, sort_keys=sort_keys).decode("utf-8")
+
+def jloads(buf: Any) -> Any:
+    """Parse JSON from bytes or str, via orjson when available."""
+    if orjson is not None:
+        return orjson.loads(buf)
+    return json.loads(buf)
+
 # ---------------- STATE ----------------
-_state_lock = asyncio.Lock()
+_state_lock: Optional[asyncio.Lock] = None
+MAX_ALERTS = 400
 DEFAULT_STATE = {"alerts_subscribers": [], "monitor_prev": {}, "monitor_alerts": [], "dash_message": None}
 state: Dict[str, Any] = {}
 
+def apply_state_op(st: Dict[str, Any], op: Dict[str, Any]):
+    """Apply one delta-log entry to a state dict (used when replaying the log)."""
+    kind = op.get("op")
+    if kind == "set":
+        st[op["k"]] = op["v"]
+    elif kind == "prev":
+        st.setdefault("monitor_prev", {})[op["k"]] = op["v"]
+    elif kind == "alert_add":
+        alerts = st.setdefault("monitor_alerts", [])
+        alerts.insert(0, op["a"])
+        del alerts[MAX_ALERTS:]
+    elif kind == "sub_add":
+        subs = st.setdefault("alerts_subscribers", [])
+        if op["uid"] not in subs:
+            subs.append(op["uid"])
+    elif kind == "sub_del":
+        subs = st.setdefault("alerts_subscribers", [])
+        if op["uid"] in subs:
+            subs.remove(op["uid"])
+
 def load_state():
     global state
     if os.path.exists(STATE_PATH):
         try:
-            with open(STATE_PATH, "r", encoding="utf-8") as f:
-                state = json.load(f)
+            with open(STATE_PATH, "rb") as f:
+                state = jloads(f.read())
         except Exception:
-            state = DEFAULT_STATE.copy()
+            state = copy.deepcopy(DEFAULT_STATE)
     else:
-        state = DEFAULT_STATE.copy()
+        state = copy.deepcopy(DEFAULT_STATE)
+    
+    # replay mutations recorded since the last full snapshot
+    if os.path.exists(STATE_LOG_PATH):
+        try:
+            with open(STATE_LOG_PATH, "rb") as f:
+                for line in f:
+                    try:
+                        apply_state_op(state, jloads(line))
+                    except Exception:
+                        pass  # blank or torn trailing line
+        except Exception as e:
+            log.error("[load_state] log replay failed: %s", e)
+
+def _atomic_write(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def get_state_lock() -> asyncio.Lock:
+    # created on first use, from inside the running loop, rather than at import time
+    global _state_lock
+    if _state_lock is None:
+        _state_lock = asyncio.Lock()
+    return _state_lock
 
 async def save_state():
-    async with _state_lock:
+    # the monitor keeps its alerts in a bounded deque; materialize it only for the snapshot
+    state["monitor_alerts"] = list(monitor.alerts)
+    state["alerts_subscribers"] = sorted(alert_subscribers)
+    # serialize here so the snapshot is consistent with `state`; only the file I/O leaves the loop
+    try:
+        data = jdumpb(state, indent=True)
+    except Exception as e:
+        log.error("[save_state] %s", e)
+        return
+    async with get_state_lock():
+        try:
+            await asyncio.to_thread(_atomic_write, STATE_PATH, data)
+        except Exception as e:
+            log.error("[save_state] %s", e)
+
+# Mutations are appended to STATE_LOG_PATH as one JSON op per line by a background
+# writer; once the log passes STATE_LOG_MAX bytes it is folded into a full snapshot.
+_state_ops: Optional[asyncio.Queue] = None
+_state_writer: Optional[asyncio.Task] = None
+
+def log_state_op(op: Dict[str, Any]):
+    """Record a mutation that has already been applied to `state`."""
+    global _state_ops, _state_writer
+    if _state_ops is None:
+        _state_ops = asyncio.Queue()
+    if _state_writer is None or _state_writer.done():
+        _state_writer = asyncio.create_task(_state_log_writer())
+    _state_ops.put_nowait(op)
+
+def _append_bytes(path: str, data: bytes) -> int:
+    with open(path, "ab") as f:
+        f.write(data)
+        return f.tell()
+
+async def compact_state():
+    # every queued op is already reflected in `state`, so the snapshot supersedes them
+    while not _state_ops.empty():
+        _state_ops.get_nowait()
+    await save_state()
+    open(STATE_LOG_PATH, "wb").close()
+
+async def flush_state():
+    """Stop the log writer and fold everything into a fresh snapshot (used on shutdown)."""
+    global _state_writer
+    if _state_writer is not None:
+        _state_writer.cancel()
+        _state_writer = None
+    if _state_ops is not None:
+        await compact_state()
+
+async def _state_log_writer():
+    while True:
+        ops = [await _state_ops.get()]
+        # debounce so a burst (scan + alerts + subscribe) lands in a single append
+        await asyncio.sleep(STATE_FLUSH_DEBOUNCE)
+        while not _state_ops.empty():
+            ops.append(_state_ops.get_nowait())
         try:
-            with open(STATE_PATH, "w", encoding="utf-8") as f:
-                json.dump(state, f, default=str, indent=2)
+            data = b"".join(jdumpb(op) + b"\n" for op in ops)
+            size = await asyncio.to_thread(_append_bytes, STATE_LOG_PATH, data)
+            if size > STATE_LOG_MAX:
+                await compact_state()
         except Exception as e:
-            print("[save_state]", e)
+            log.error("[state_log] %s", e)
 
 load_state()
+# membership set for the subscriber ids; written back to state["alerts_subscribers"] as a sorted list on save
+alert_subscribers: set = set(state.get("alerts_subscribers") or [])
 
 # ---------------- UTIL ----------------
 def now_utc() -> datetime:
@@ -102,22 +360,55 @@ def now_utc() -> datetime:
 
 def safe_truncate(s: Optional[str], n: int) -> str:
     if s is None: return ""
-    s = str(s)
+    if type(s) is not str:
+        s = str(s)
     return s if len(s) <= n else s[:n-3] + "..."
 
+# typed=True so 1 and 1.0 (equal, same hash) don't share a cache slot; -0.0 and 0.0 still
+# would, so callers pass floats as v + 0.0 (which turns -0.0 into 0.0)
+@lru_cache(maxsize=4096, typed=True)
+def _fmt_number(v: Any, decimals: int) -> str:
+    if isinstance(v, int):
+        return f"{v:,}"
+    return f"{v:,.{decimals}f}"
+
 def fmt_num(v: Any, decimals: int = 2) -> str:
+    t = type(v)
+    if t is int:
+        return _fmt_number(v, decimals)
+    if t is float:
+        return _fmt_number(v + 0.0, decimals)
+    # names/statuses end up here too; only strings that start like a number are worth float()
+    if t is str and not (v.lstrip()[:1].isdigit() or v.lstrip()[:1] in ("-", "+", ".")):
+        return v
     try:
         if isinstance(v, int):
-            return f"{v:,}"
+            return _fmt_number(v, decimals)
         if isinstance(v, float):
-            return f"{v:,.{decimals}f}"
+            return _fmt_number(v + 0.0, decimals)
         fv = float(v)
         if abs(fv - int(fv)) < 1e-9:
-            return f"{int(fv):,}"
-        return f"{fv:,.{decimals}f}"
+            return _fmt_number(int(fv), decimals)
+        return _fmt_number(fv + 0.0, decimals)
     except Exception:
         return str(v)
 
+def as_float(v: Any) -> Optional[float]:
+    """float(v), or None when v is not numeric; ints/floats skip the try."""
+    if type(v) is float or type(v) is int:
+        return float(v)
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def coerce_items(resp: Any, key: str = "items") -> List[Any]:
+    """The list in resp[key] for paginated {key: [...]} responses, resp itself for bare lists, else []."""
+    if isinstance(resp, dict):
+        items = resp.get(key)
+        return items if isinstance(items, list) else []
+    return resp if isinstance(resp, list) else []
+
 def format_date_iso(iso_s: str) -> str:
     try:
         dt = datetime.fromisoformat(iso_s.replace("Z", "+00:00")) 
@@ -125,9 +416,19 @@ def format_date_iso(iso_s: str) -> str:
     except Exception:
         return iso_s
 
+def snapshot_digest(obj: Any) -> bytes:
+    """Stable short hash of a JSON-like payload, used to skip diffs when nothing changed."""
+    return hashlib.blake2b(jdumpb(obj, sort_keys=True), digest_size=16).digest()
+
+def add_fields(embed: discord.Embed, triples: List[Tuple[str, str, bool]]) -> discord.Embed:
+    """Embed.add_field for each prebuilt (name, value, inline) triple."""
+    for n, v, i in triples:
+        embed.add_field(name=n, value=v, inline=i)
+    return embed
+
 def codeblock_json(obj: Any) -> str:
     try:
-        j = json.dumps(obj, indent=2, default=str)
+        j = jdumps(obj, indent=True)
     except Exception:
         j = str(obj)
     if len(j) > 1900:
@@ -135,77 +436,336 @@ def codeblock_json(obj: Any) -> str:
     return f"```json\n{j}\n```"
 
 # ---------------- WarEra API client ----------------
+@lru_cache(maxsize=1024)
+def trpc_url(base: str, endpoint: str, input_json: str) -> str:
+    ep = endpoint.strip().lstrip("/")
+    return f"{base}/{ep}?input={urllib.parse.quote_from_bytes(input_json.encode('utf-8'), safe='')}"
+
+def trpc_batch_url(base: str, endpoints: Sequence[str], input_jsons: Sequence[str]) -> str:
+    """One GET for several procedures: comma-joined paths, inputs keyed by position."""
+    path = ",".join(ep.strip().lstrip("/") for ep in endpoints)
+    input_json = "{" + ",".join(f'"{i}":{ij}' for i, ij in enumerate(input_jsons)) + "}"
+    return f"{base}/{path}?batch=1&input={urllib.parse.quote_from_bytes(input_json.encode('utf-8'), safe='')}"
+
+def trpc_unwrap(d: Any) -> Any:
+    """The payload of one tRPC response envelope ({"result": {"data": ...}}); None for an error envelope."""
+    if isinstance(d, dict):
+        if "result" in d:
+            res = d["result"]
+            if isinstance(res, dict) and "data" in res:
+                return res["data"]
+            return res
+        if "error" in d:
+            return None
+    return d
+
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+RETRY_AFTER_MAX = 30.0
+
+def retry_after(value: Optional[str]) -> float:
+    """Seconds from a numeric Retry-After header, capped; 0 when absent or not numeric."""
+    try:
+        return min(max(float(value), 0.0), RETRY_AFTER_MAX)
+    except (TypeError, ValueError):
+        return 0.0
+
+class TokenBucket:
+    """Request pacing: `rate_per_min` tokens/minute, holding at most `capacity`."""
+    def __init__(self, rate_per_min: float, capacity: int):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(max(1, capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # take the token now (possibly going negative) so concurrent callers queue up behind
+        # each other instead of all waking for the same refill
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
 class WarEraAPI:
-    def __init__(self, base: str = API_BASE):
+    def __init__(self, base: str = API_BASE, cache_ttl: float = API_CACHE_TTL, cache_ttls: Optional[Dict[str, float]] = None):
         self.base = base.rstrip("/")
+        self.cache_ttl = cache_ttl
+        self.cache_ttls = API_CACHE_TTLS if cache_ttls is None else cache_ttls
+        self.limiter = TokenBucket(API_RPM, API_BURST)
+        self._endpoint_ttl: Dict[str, float] = {}
+        # (endpoint, params_json) -> (fresh_until, stale_until, data), least recently used first;
+        # shared by monitor_loop, dash_loop and commands
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, float, Any]]" = OrderedDict()
+        # keys whose last call was answered from a stale entry because the refetch failed
+        self._stale: set = set()
+        # the fetch task (or batch future) per key while a request is out; concurrent callers await the same one
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # running _fill_batch tasks; their futures are in _inflight, this keeps the tasks themselves alive
+        self._batches: set = set()
+        # switched off when the server rejects batch requests (4xx); calls then go out one by one
+        self.batching = API_BATCH_MAX > 1
+        # bounds the one-by-one requests of call_batch, and of batches that had to be split up
+        self._unbatched = asyncio.Semaphore(USER_LOOKUP_CONCURRENCY)
+
+    def ttl_for(self, endpoint: str) -> float:
+        """cache_ttl, or the override for the longest matching prefix in cache_ttls."""
+        ttl = self._endpoint_ttl.get(endpoint)
+        if ttl is None:
+            matches = [p for p in self.cache_ttls if endpoint.startswith(p)]
+            ttl = self.cache_ttls[max(matches, key=len)] if matches else self.cache_ttl
+            self._endpoint_ttl[endpoint] = ttl
+        return ttl
+
+    @staticmethod
+    def params_json(params: Optional[Dict]) -> str:
+        """Canonical compact JSON for a tRPC input; used both in the URL and as the cache key."""
+        return jdumps(params or {}, sort_keys=True)
 
     def build_url(self, endpoint: str, params: Optional[Dict] = None) -> str:
-        ep = endpoint.strip().lstrip("/")
-        url = f"{self.base}/{ep}"
-        input_json = json.dumps(params or {}, separators=(",", ":"))
-        encoded = urllib.parse.quote(input_json, safe='')
-        return f"{url}?input={encoded}"
+        return trpc_url(self.base, endpoint, self.params_json(params))
+
+    def _cache_get(self, key: Tuple[str, str], stale: bool = False) -> Optional[Any]:
+        hit = self._cache.get(key)
+        if hit is not None and time.monotonic() < hit[1 if stale else 0]:
+            self._cache.move_to_end(key)
+            return hit[2]
+        return None
+
+    def _cache_put(self, key: Tuple[str, str], data: Any):
+        now = time.monotonic()
+        if key not in self._cache and len(self._cache) >= API_CACHE_MAX:
+            for k in [k for k, (_, stale_until, _) in self._cache.items() if stale_until <= now]:
+                del self._cache[k]
+            # still full of live entries: drop the least recently used
+            while len(self._cache) >= API_CACHE_MAX:
+                self._cache.popitem(last=False)
+        ttl = self.ttl_for(key[0])
+        self._cache[key] = (now + ttl, now + ttl * API_STALE_FACTOR, data)
+        self._cache.move_to_end(key)
+
+    def invalidate(self, endpoint_prefix: str = "") -> int:
+        """Expire cached responses for endpoints starting with endpoint_prefix (all by default).
+        
+        Entries stay around as stale fallbacks, so a failing refetch still has something to serve."""
+        n = 0
+        for key, (fresh_until, stale_until, data) in self._cache.items():
+            if key[0].startswith(endpoint_prefix) and fresh_until > 0:
+                self._cache[key] = (0.0, stale_until, data)
+                n += 1
+        return n
+
+    def is_stale(self, endpoint: str, params: Optional[Dict] = None) -> bool:
+        """True when the last call for this request got last-known-good data after a failed fetch."""
+        return (endpoint, self.params_json(params)) in self._stale
 
     async def call(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Any]:
-        url = self.build_url(endpoint, params)
+        """Cached call: identical requests within the endpoint's TTL share one response (and one in-flight fetch)."""
+        input_json = self.params_json(params)
+        key = (endpoint, input_json)
+        data = self._cache_get(key)
+        if data is not None:
+            return data
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._fill(key, endpoint, params, input_json))
+        # shielded so one caller giving up doesn't cancel the fetch the others are waiting on
+        return await asyncio.shield(task)
+
+    async def call_batch(self, calls: Sequence[Tuple[str, Optional[Dict]]]) -> List[Optional[Any]]:
+        """call() for many requests at once (results in order); cache misses go out as tRPC batches of API_BATCH_MAX."""
+        results: List[Optional[Any]] = [None] * len(calls)
+        waits: List[Tuple[int, asyncio.Future]] = []
+        misses: Dict[Tuple[str, str], List[int]] = {}
+        for i, (endpoint, params) in enumerate(calls):
+            key = (endpoint, self.params_json(params))
+            data = self._cache_get(key)
+            if data is not None:
+                results[i] = data
+            elif key in self._inflight:
+                waits.append((i, self._inflight[key]))
+            else:
+                misses.setdefault(key, []).append(i)
+        
+        if not self.batching:
+            keys = list(misses)
+            
+            async def one(key: Tuple[str, str]):
+                async with self._unbatched:
+                    return await self.call(key[0], calls[misses[key][0]][1])
+            
+            for key, data in zip(keys, await asyncio.gather(*(one(k) for k in keys))):
+                for i in misses[key]:
+                    results[i] = data
+        elif misses:
+            loop = asyncio.get_running_loop()
+            keys = list(misses)
+            for n in range(0, len(keys), API_BATCH_MAX):
+                chunk = keys[n:n + API_BATCH_MAX]
+                futs = [loop.create_future() for _ in chunk]
+                for key, fut in zip(chunk, futs):
+                    self._inflight[key] = fut
+                    waits.extend((i, fut) for i in misses[key])
+                task = asyncio.create_task(self._fill_batch(chunk, futs))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+        
+        if waits:
+            for (i, _), data in zip(waits, await asyncio.gather(*(asyncio.shield(f) for _, f in waits))):
+                results[i] = data
+        return results
+
+    def _settle(self, key: Tuple[str, str], data: Optional[Any]) -> Optional[Any]:
+        """Cache a fresh response, or fall back to the last good one while it is within the stale window."""
+        if data is not None:
+            self._cache_put(key, data)
+            self._stale.discard(key)
+            return data
+        data = self._cache_get(key, stale=True)
+        if data is not None:
+            self._stale.add(key)
+        else:
+            self._stale.discard(key)
+        return data
+
+    async def _fill(self, key: Tuple[str, str], endpoint: str, params: Optional[Dict], input_json: str) -> Optional[Any]:
+        try:
+            return self._settle(key, await self._fetch(endpoint, params, input_json))
+        finally:
+            del self._inflight[key]
+
+    async def _fill_batch(self, keys: List[Tuple[str, str]], futs: List[asyncio.Future]):
+        try:
+            url = trpc_batch_url(self.base, [k[0] for k in keys], [k[1] for k in keys])
+            statuses: List[int] = []
+            d = await self._get_json(url, f"batch of {len(keys)} ({keys[0][0]}, ...)", ok=(200, 207), statuses=statuses)
+            if isinstance(d, list) and len(d) == len(keys):
+                rows = [trpc_unwrap(row) for row in d]
+            else:
+                if statuses and 400 <= statuses[-1] < 500 and statuses[-1] not in RETRY_STATUSES and self.batching:
+                    self.batching = False
+                    log.warning("[WarEraAPI] batch requests rejected (HTTP %s); sending calls one by one", statuses[-1])
+                # a failed or malformed batch must not blank every result: fetch its calls one by one
+                rows = await asyncio.gather(*(self._fetch_unbatched(k) for k in keys))
+            for key, fut, row in zip(keys, futs, rows):
+                fut.set_result(self._settle(key, row))
+        finally:
+            for key, fut in zip(keys, futs):
+                del self._inflight[key]
+                if not fut.done():
+                    fut.set_result(None)
+
+    async def _fetch_unbatched(self, key: Tuple[str, str]) -> Optional[Any]:
+        async with self._unbatched:
+            return await self._fetch(key[0], jloads(key[1]), key[1])
+
+    async def _fetch(self, endpoint: str, params: Optional[Dict], input_json: str) -> Optional[Any]:
+        url = trpc_url(self.base, endpoint, input_json)
+        d = await self._get_json(url, f"{endpoint} {params}")
+        return None if d is None else trpc_unwrap(d)
+
+    async def _get_json(self, url: str, what: str, ok: Tuple[int, ...] = (200,), statuses: Optional[List[int]] = None) -> Optional[Any]:
+        """GET url as JSON with retries; None on failure. HTTP statuses seen are appended to statuses."""
         sess = await get_session()
         exc = None
+        delay = 0.0
         for attempt in range(RETRY_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(delay)
+            # jittered so concurrent failures don't all retry in the same instant
+            delay = RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.75, 1.25)
             try:
+                # only cache misses reach here, so the budget is spent on real requests (retries included)
+                await self.limiter.acquire()
                 async with sess.get(url) as resp:
-                    txt = await resp.text()
-                    if resp.status != 200:
-                        exc = Exception(f"HTTP {resp.status}: {txt[:200]}")
-                        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
-                        continue
-                    d = json.loads(txt)
-                    if isinstance(d, dict) and "result" in d:
-                        res = d["result"]
-                        if isinstance(res, dict) and "data" in res:
-                            return res["data"]
-                        return res
-                    return d
-            except Exception as e:
+                    buf = await resp.read()
+                    if statuses is not None:
+                        statuses.append(resp.status)
+                    if resp.status in ok:
+                        return jloads(buf)
+                    exc = Exception(f"HTTP {resp.status}: {buf[:200].decode('utf-8', 'replace')}")
+                    if resp.status not in RETRY_STATUSES:
+                        break  # a client error won't go away on retry
+                    if resp.status == 429:
+                        delay = max(delay, retry_after(resp.headers.get("Retry-After")))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 exc = e
-                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
-        print(f"[WarEraAPI] failed {endpoint} {params}: {exc}")
+            except ValueError as e:
+                exc = e  # not JSON; the same body would come back
+                break
+        log.warning("[WarEraAPI] failed %s: %s", what, exc)
         return None
 
 war_api = WarEraAPI()
 
 # ---------------- Entity helpers ----------------
+_AVATAR_KEYS = ("animatedAvatarUrl", "avatarUrl", "avatar", "image", "picture", "flag")
+
 def extract_avatar(obj: Dict[str,Any]) -> Optional[str]:
-    for k in ("animatedAvatarUrl","avatarUrl","avatar","image","picture","flag"):
-        v = obj.get(k)
-        if isinstance(v,str) and v.startswith("http"):
-            return v
-    if isinstance(obj.get("user"), dict):
-        return extract_avatar(obj["user"])
-    if isinstance(obj.get("country"), dict):
-        return extract_avatar(obj["country"])
-    return None
+    # walks nested user/country objects iteratively instead of recursing
+    while True:
+        for k in _AVATAR_KEYS:
+            v = obj.get(k)
+            if type(v) is str and v.startswith("http"):
+                return v
+        if type(nxt := obj.get("user")) is dict or type(nxt := obj.get("country")) is dict:
+            obj = nxt
+        else:
+            return None
+
+# ObjectId (24), cuid (26) and UUID (36) lengths
+_ID_LENS = frozenset((24, 26, 36))
 
 def is_likely_id(s: Any) -> bool:
-    return isinstance(s, str) and len(s) in (24,26,36)
+    return type(s) is str and len(s) in _ID_LENS
+
+# checked in order; the first rule sharing a key with the item wins
+_ICON_RULES = (
+    (frozenset({"companyId", "company"}), ICON_COMPANY),
+    (frozenset({"countryId", "country"}), ICON_COUNTRY),
+    (frozenset({"region", "regionId"}), ICON_REGION),
+    (frozenset({"members", "muId"}), ICON_MU),
+    (frozenset({"battleId", "attacker"}), ICON_BATTLE),
+    (frozenset({"partyId", "party"}), ICON_PARTY),
+    (frozenset({"articleId", "article"}), ICON_ARTICLE),
+)
 
 def get_entity_icon(item: Dict[str,Any]) -> str:
     """Return appropriate emoji based on entity type"""
-    if "companyId" in item or "company" in item:
-        return ICON_COMPANY
-    if "countryId" in item or "country" in item:
-        return ICON_COUNTRY
-    if "region" in item or "regionId" in item:
-        return ICON_REGION
-    if "members" in item or "muId" in item:
-        return ICON_MU
-    if "battleId" in item or "attacker" in item:
-        return ICON_BATTLE
-    if "partyId" in item or "party" in item:
-        return ICON_PARTY
-    if "articleId" in item or "article" in item:
-        return ICON_ARTICLE
+    keys = item.keys()
+    for rule_keys, icon in _ICON_RULES:
+        if not keys.isdisjoint(rule_keys):
+            return icon
     return ICON_USER
 
+# key families probed by link_for_entity; one set intersection per item tells it which branches can match
+_LB_USER, _LB_RESOLVED, _LB_STAT, _LB_COUNTRY, _LB_COMPANY, _LB_REGION = 1, 2, 4, 8, 16, 32
+_LB_MU, _LB_PARTY, _LB_BATTLE, _LB_TITLE, _LB_CONTENT = 64, 128, 256, 512, 1024
+_RESOLVED_KEYS = ("resolved_user", "resolved_userId", "resolved_from", "resolved_to", "resolved_buyer", "resolved_seller", "resolved_attacker", "resolved_defender")
+_LINK_KEY_BITS = {
+    "user": _LB_USER, "wealth": _LB_STAT, "damage": _LB_STAT,
+    "countryId": _LB_COUNTRY, "country": _LB_COUNTRY,
+    "companyId": _LB_COMPANY, "company": _LB_COMPANY,
+    "regionId": _LB_REGION, "region": _LB_REGION,
+    "members": _LB_MU, "muId": _LB_MU,
+    "partyId": _LB_PARTY, "party": _LB_PARTY,
+    "battleId": _LB_BATTLE, "attacker": _LB_BATTLE, "defender": _LB_BATTLE,
+    "title": _LB_TITLE, "content": _LB_CONTENT,
+    **{k: _LB_RESOLVED for k in _RESOLVED_KEYS},
+}
+_LINK_KEYS = _LINK_KEY_BITS.keys()
+
+_USER_URL, _COUNTRY_URL, _COMPANY_URL, _REGION_URL = URLS["user"], URLS["country"], URLS["company"], URLS["region"]
+_MU_URL, _PARTY_URL, _BATTLE_URL, _ARTICLE_URL = URLS["mu"], URLS["party"], URLS["battle"], URLS["article"]
+_ICON_URL = {
+    ICON_USER: _USER_URL, ICON_COMPANY: _COMPANY_URL, ICON_COUNTRY: _COUNTRY_URL,
+    ICON_REGION: _REGION_URL, ICON_MU: _MU_URL, ICON_BATTLE: _BATTLE_URL,
+    ICON_ARTICLE: _ARTICLE_URL, ICON_PARTY: _PARTY_URL
+}
+
 def link_for_entity(item: Any) -> Tuple[str, Optional[str], str]:
     """
     Returns (name_with_link, avatar_url, icon_emoji)
@@ -214,106 +774,106 @@ def link_for_entity(item: Any) -> Tuple[str, Optional[str], str]:
     if not isinstance(item, dict):
         s = str(item)
         if is_likely_id(s):
-            return (f"[`{safe_truncate(s,24)}`]({URLS['user']}{s})", None, ICON_USER)
+            return (f"[`{safe_truncate(s,24)}`]({_USER_URL}{s})", None, ICON_USER)
         return (safe_truncate(s,40), None, ICON_USER)
 
+    bits = 0
+    for k in item.keys() & _LINK_KEYS:
+        bits |= _LINK_KEY_BITS[k]
+
     # nested user object (highest priority)
-    if isinstance(item.get("user"), dict):
+    if bits & _LB_USER and isinstance(item["user"], dict):
         u = item["user"]
         uid = u.get("_id") or u.get("id")
         name = u.get("name") or u.get("username") or uid
         if uid:
-            return (f"[{safe_truncate(name,40)}]({URLS['user']}{uid})", extract_avatar(u), ICON_USER)
+            return (f"[{safe_truncate(name,40)}]({_USER_URL}{uid})", extract_avatar(u), ICON_USER)
     
     # Check for other resolved user objects
-    for key in ("resolved_user", "resolved_userId", "resolved_from", "resolved_to", "resolved_buyer", "resolved_seller", "resolved_attacker", "resolved_defender"):
-        if isinstance(item.get(key), dict):
-            u = item[key]
-            uid = u.get("_id") or u.get("id") or u.get("user")
-            name = u.get("name") or u.get("username") or uid
-            if uid:
-                return (f"[{safe_truncate(name,40)}]({URLS['user']}{uid})", extract_avatar(u), ICON_USER)
+    if bits & _LB_RESOLVED:
+        for key in _RESOLVED_KEYS:
+            if isinstance(item.get(key), dict):
+                u = item[key]
+                uid = u.get("_id") or u.get("id") or u.get("user")
+                name = u.get("name") or u.get("username") or uid
+                if uid:
+                    return (f"[{safe_truncate(name,40)}]({_USER_URL}{uid})", extract_avatar(u), ICON_USER)
 
     # direct user id with name in item
     uid = item.get("user") or item.get("userId") or item.get("_id") or item.get("id")
-    if is_likely_id(uid) and not item.get("countryId"):
+    if bits & _LB_STAT and is_likely_id(uid) and not item.get("countryId"):
         name = item.get("name") or item.get("username") or uid
-        if "wealth" in item or "damage" in item:
-             return (f"[{safe_truncate(name,40)}]({URLS['user']}{uid})", extract_avatar(item), ICON_USER)
+        return (f"[{safe_truncate(name,40)}]({_USER_URL}{uid})", extract_avatar(item), ICON_USER)
     
     # country
-    cc = item.get("countryId") or item.get("country")
-    if isinstance(cc, dict):
-        cc_id = cc.get("_id") or cc.get("id")
-        name = cc.get("name") or cc_id
-        if cc_id:
-            return (f"[{safe_truncate(name,40)}]({URLS['country']}{cc_id})", extract_avatar(cc), ICON_COUNTRY)
-    elif cc and is_likely_id(cc) and not item.get("companyId"):
-        name = item.get("name") or item.get("countryName") or cc
-        return (f"[{safe_truncate(name,40)}]({URLS['country']}{cc})", extract_avatar(item), ICON_COUNTRY)
+    if bits & _LB_COUNTRY:
+        cc = item.get("countryId") or item.get("country")
+        if isinstance(cc, dict):
+            cc_id = cc.get("_id") or cc.get("id")
+            name = cc.get("name") or cc_id
+            if cc_id:
+                return (f"[{safe_truncate(name,40)}]({_COUNTRY_URL}{cc_id})", extract_avatar(cc), ICON_COUNTRY)
+        elif cc and is_likely_id(cc) and not item.get("companyId"):
+            name = item.get("name") or item.get("countryName") or cc
+            return (f"[{safe_truncate(name,40)}]({_COUNTRY_URL}{cc})", extract_avatar(item), ICON_COUNTRY)
     
     # company
-    cid = item.get("companyId") or item.get("company")
-    if isinstance(cid, dict):
-        cid_id = cid.get("_id") or cid.get("id")
-        name = cid.get("name") or cid.get("title") or cid_id
-        if cid_id:
-            return (f"[{safe_truncate(name,40)}]({URLS['company']}{cid_id})", extract_avatar(cid), ICON_COMPANY)
-    elif cid and is_likely_id(cid):
-        name = item.get("name") or item.get("title") or cid
-        return (f"[{safe_truncate(name,40)}]({URLS['company']}{cid})", extract_avatar(item), ICON_COMPANY)
+    if bits & _LB_COMPANY:
+        cid = item.get("companyId") or item.get("company")
+        if isinstance(cid, dict):
+            cid_id = cid.get("_id") or cid.get("id")
+            name = cid.get("name") or cid.get("title") or cid_id
+            if cid_id:
+                return (f"[{safe_truncate(name,40)}]({_COMPANY_URL}{cid_id})", extract_avatar(cid), ICON_COMPANY)
+        elif cid and is_likely_id(cid):
+            name = item.get("name") or item.get("title") or cid
+            return (f"[{safe_truncate(name,40)}]({_COMPANY_URL}{cid})", extract_avatar(item), ICON_COMPANY)
     
     # region
-    rid = item.get("regionId") or item.get("region")
-    if isinstance(rid, dict):
-        rid_id = rid.get("_id") or rid.get("id")
-        name = rid.get("name") or rid_id
-        if rid_id:
-            return (f"[{safe_truncate(name,40)}]({URLS['region']}{rid_id})", extract_avatar(rid), ICON_REGION)
-    elif rid and is_likely_id(rid):
-        name = item.get("name") or item.get("regionName") or rid
-        return (f"[{safe_truncate(name,40)}]({URLS['region']}{rid})", extract_avatar(item), ICON_REGION)
+    if bits & _LB_REGION:
+        rid = item.get("regionId") or item.get("region")
+        if isinstance(rid, dict):
+            rid_id = rid.get("_id") or rid.get("id")
+            name = rid.get("name") or rid_id
+            if rid_id:
+                return (f"[{safe_truncate(name,40)}]({_REGION_URL}{rid_id})", extract_avatar(rid), ICON_REGION)
+        elif rid and is_likely_id(rid):
+            name = item.get("name") or item.get("regionName") or rid
+            return (f"[{safe_truncate(name,40)}]({_REGION_URL}{rid})", extract_avatar(item), ICON_REGION)
     
     # mu (check for 'members' field)
-    if item.get("members") is not None or item.get("muId"):
+    if bits & _LB_MU and (item.get("members") is not None or item.get("muId")):
         mid_ = item.get("muId") or item.get("_id") or item.get("id")
         name = item.get("name") or mid_
         if mid_:
-            return (f"[{safe_truncate(name,40)}]({URLS['mu']}{mid_})", extract_avatar(item), ICON_MU)
+            return (f"[{safe_truncate(name,40)}]({_MU_URL}{mid_})", extract_avatar(item), ICON_MU)
     
     # party
-    pid = item.get("partyId") or item.get("party")
-    if pid and is_likely_id(pid):
-        name = item.get("name") or item.get("partyName") or pid
-        return (f"[{safe_truncate(name,40)}]({URLS['party']}{pid})", extract_avatar(item), ICON_PARTY)
+    if bits & _LB_PARTY:
+        pid = item.get("partyId") or item.get("party")
+        if pid and is_likely_id(pid):
+            name = item.get("name") or item.get("partyName") or pid
+            return (f"[{safe_truncate(name,40)}]({_PARTY_URL}{pid})", extract_avatar(item), ICON_PARTY)
     
     # battle
-    if item.get("battleId") or (item.get("_id") and ("attacker" in item or "defender" in item)):
+    if bits & _LB_BATTLE and (item.get("battleId") or (item.get("_id") and ("attacker" in item or "defender" in item))):
         bid = item.get("battleId") or item.get("_id") or item.get("id")
         name = item.get("title") or bid
         if bid:
-            return (f"[{safe_truncate(name,40)}]({URLS['battle']}{bid})", extract_avatar(item), ICON_BATTLE)
+            return (f"[{safe_truncate(name,40)}]({_BATTLE_URL}{bid})", extract_avatar(item), ICON_BATTLE)
     
     # article (check for title field)
-    if item.get("title") and item.get("_id") and is_likely_id(item.get("_id")) and "content" in item:
-        aid = item.get("_id")
-        name = item.get("title")
-        return (f"[{safe_truncate(name,40)}]({URLS['article']}{aid})", extract_avatar(item), ICON_ARTICLE)
+    if bits & (_LB_TITLE | _LB_CONTENT) == _LB_TITLE | _LB_CONTENT and item["title"] and is_likely_id(item.get("_id")):
+        aid = item["_id"]
+        name = item["title"]
+        return (f"[{safe_truncate(name,40)}]({_ARTICLE_URL}{aid})", extract_avatar(item), ICON_ARTICLE)
     
     # fallback: generic _id
     final_id = uid or item.get("_id") or item.get("id")
     if final_id and is_likely_id(final_id):
         name = item.get("name") or item.get("title") or item.get("username") or str(final_id)
         icon = get_entity_icon(item)
-        
-        url_map = {
-            ICON_USER: 'user', ICON_COMPANY: 'company', ICON_COUNTRY: 'country',
-            ICON_REGION: 'region', ICON_MU: 'mu', ICON_BATTLE: 'battle',
-            ICON_ARTICLE: 'article', ICON_PARTY: 'party'
-        }
-        
-        url_key = url_map.get(icon, 'user')
-        link_url = URLS.get(url_key, URLS['user'])
+        link_url = _ICON_URL.get(icon, _USER_URL)
 
         return (f"[{safe_truncate(name,40)}]({link_url}{final_id})", extract_avatar(item), icon)
     
@@ -322,74 +882,122 @@ def link_for_entity(item: Any) -> Tuple[str, Optional[str], str]:
     return (safe_truncate(name,40), extract_avatar(item), ICON_USER)
 
 # ---------------- Make multi-item embed (10 per page) ----------------
-def make_multi_item_embed(items_batch: List[Tuple[int, Dict]], total: int, page_num: int, total_pages: int, title: str, icon: str) -> discord.Embed:
+_COLOR_GOLD = discord.Color.dark_gold()
+
+def _item_line(idx: int, item: Dict, show_zero: bool) -> str:
+    """One "#idx icon name • `value` • *tier*" description line of a multi-item page."""
+    name_link, _, item_icon = link_for_entity(item)
+    
+    val = (item.get("value") or item.get("damage") or item.get("score") or 
+           item.get("wealth") or item.get("gdp") or item.get("treasury") or 
+           item.get("population") or item.get("price") or 0)
+    
+    line = f"**#{idx}** {item_icon} {name_link}"
+    
+    try:
+        if show_zero or float(val) != 0.0: 
+            line += f" • `{fmt_num(val)}`"
+    except (ValueError, TypeError):
+        line += f" • `{fmt_num(val)}`"
+
+    tier = item.get("tier")
+    if tier:
+        line += f" • *{tier}*"
+    return line
+
+def make_multi_item_embed(items_batch: List[Tuple[int, Dict]], total: int, page_num: int, total_pages: int, title: str, icon: str, ts: Optional[datetime] = None) -> discord.Embed:
     """Create an embed with up to 10 items per page"""
     emb = discord.Embed(
         title=f"{icon} {title}",
-        color=discord.Color.dark_gold(),
-        timestamp=now_utc()
+        color=_COLOR_GOLD,
+        timestamp=ts or now_utc()
     )
+    is_ranking_or_price = "Top" in title or "Damage" in title or "Wealth" in title or "Prices" in title
     
-    desc_lines = []
-    for idx, item in items_batch:
-        name_link, avatar, item_icon = link_for_entity(item)
-        
-        val = (item.get("value") or item.get("damage") or item.get("score") or 
-               item.get("wealth") or item.get("gdp") or item.get("treasury") or 
-               item.get("population") or item.get("price") or 0)
-        
-        val_s = fmt_num(val)
-        
-        is_ranking_or_price = "Top" in title or "Damage" in title or "Wealth" in title or "Prices" in title
-        
-        line = f"**#{idx}** {item_icon} {name_link}"
-        
-        try:
-            if is_ranking_or_price or float(val) != 0.0: 
-                line += f" • `{val_s}`"
-        except (ValueError, TypeError):
-            line += f" • `{val_s}`"
-
-        if item.get("tier"):
-            line += f" • *{item.get('tier')}*"
-        
-        desc_lines.append(line)
-    
-    emb.description = "\n".join(desc_lines)
+    emb.description = "\n".join([_item_line(idx, item, is_ranking_or_price) for idx, item in items_batch])
     emb.set_footer(text=f"Page {page_num}/{total_pages} • Total: {total} entries")
     
     return emb
 
-def items_to_paginated_embeds(items: List[Dict], title: str, icon: str = ICON_DAMAGE) -> Tuple[List[discord.Embed], List[str]]:
-    """Convert items list to paginated embeds (10 per page)"""
-    pages = []
-    dev_json = []
-    total = len(items)
-    
-    for page_idx in range(0, total, 10):
-        batch = []
-        for idx in range(page_idx, min(page_idx + 10, total)):
-            item = items[idx]
-            if isinstance(item, dict):
-                batch.append((idx + 1, item))
-            else:
-                batch.append((idx + 1, {"name": str(item), "_id": str(item)}))
-        
-        page_num = (page_idx // 10) + 1
-        total_pages = (total + 9) // 10
-        
-        emb = make_multi_item_embed(batch, total, page_num, total_pages, title, icon)
-        pages.append(emb)
-        
-        dev_json.append(json.dumps([items[i] for i in range(page_idx, min(page_idx + 10, total))], default=str))
-    
-    if not pages:
-        pages.append(discord.Embed(title=title, description="No data available", timestamp=now_utc()))
-        dev_json.append("[]")
-    
-    return pages, dev_json
+class DevJsonPages:
+    """Per-page dev-view JSON, serialized when a page is opened in Dev View; keeps the last few."""
+    KEEP = 3
+
+    def __init__(self, payloads: List[Any], pending: Optional[asyncio.Future] = None):
+        self.payloads = payloads
+        # while pending runs it is still patching the payloads, so nothing is kept until it is done
+        self.pending = pending
+        self._json: "OrderedDict[int, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def __getitem__(self, idx: int) -> str:
+        j = self._json.get(idx)
+        if j is not None:
+            self._json.move_to_end(idx)
+            return j
+        j = jdumps(self.payloads[idx], indent=True)
+        if self.pending is not None and not self.pending.done():
+            return j
+        self._json[idx] = j
+        if len(self._json) > self.KEEP:
+            self._json.popitem(last=False)
+        return j
+
+class EmbedPages:
+    """Paginated item embeds (10 per page), rendered when a page is shown; keeps the last few."""
+    KEEP = 3
+
+    def __init__(self, items: List[Any], title: str, icon: str, pending: Optional[asyncio.Future] = None):
+        self.items = items
+        self.title = title
+        self.icon = icon
+        self.total_pages = (len(items) + 9) // 10
+        # every page of one result set carries the time it was fetched
+        self.ts = now_utc()
+        # while pending runs it is still patching the items, so nothing is kept until it is done
+        self.pending = pending
+        self._rendered: "OrderedDict[int, discord.Embed]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return max(1, self.total_pages)
+
+    def __getitem__(self, idx: int) -> discord.Embed:
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        emb = self._rendered.get(idx)
+        if emb is not None:
+            self._rendered.move_to_end(idx)
+            return emb
+        if not self.items:
+            emb = discord.Embed(title=self.title, description="No data available", timestamp=self.ts)
+        else:
+            start = idx * 10
+            batch = [
+                (i + 1, item if isinstance(item, dict) else {"name": str(item), "_id": str(item)})
+                for i, item in enumerate(self.items[start:start + 10], start)
+            ]
+            emb = make_multi_item_embed(batch, len(self.items), idx + 1, self.total_pages, self.title, self.icon, self.ts)
+        if self.pending is not None and not self.pending.done():
+            return emb
+        self._rendered[idx] = emb
+        if len(self._rendered) > self.KEEP:
+            self._rendered.popitem(last=False)
+        return emb
+
+def items_to_paginated_embeds(items: List[Dict], title: str, icon: str = ICON_DAMAGE, pending: Optional[asyncio.Future] = None) -> Tuple[EmbedPages, DevJsonPages]:
+    """Convert items list to paginated embeds (10 per page); pages are built on first view.
+    
+    pending is a task still filling in the items (e.g. background names); pages aren't kept until it's done."""
+    dev_payloads = [items[i:i + 10] for i in range(0, len(items), 10)] or [[]]
+    return EmbedPages(items, title, icon, pending), DevJsonPages(dev_payloads, pending)
 
 # ---------------- Name Resolution for Generic Lists ----------------
+async def fetch_users_lite(uids: List[str]) -> List[Any]:
+    """user.getUserLite for each uid (results in order), batched into as few requests as possible."""
+    return await war_api.call_batch([("user.getUserLite", {"userId": uid}) for uid in uids])
+
 async def resolve_user_names_in_list(items: List[Any]) -> List[Dict]:
     """
     Resolves 'user' IDs and other entity IDs to names in a list concurrently.
@@ -407,26 +1015,35 @@ async def resolve_user_names_in_list(items: List[Any]) -> List[Dict]:
             if isinstance(uid, str) and is_likely_id(uid): 
                 uids_to_fetch.add(uid)
 
-    fetch_tasks = [war_api.call("user.getUserLite", {"userId": uid}) for uid in uids_to_fetch]
-    
-    if fetch_tasks:
-        results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
+    if uids_to_fetch:
         uids_list = list(uids_to_fetch)
+        results = await fetch_users_lite(uids_list)
         for uid, r in zip(uids_list, results):
             if isinstance(r, dict):
                 uid_map[uid] = r
             
+    # API payloads are shared through war_api's cache, so resolve into copies
+    resolved = []
     for item in items:
-        if not isinstance(item, dict): continue
-        
-        for k in uid_fields:
-            uid = item.get(k)
-            if isinstance(uid, str) and uid in uid_map:
-                item[k] = uid_map[uid] 
+        if isinstance(item, dict):
+            hits = {k: uid_map[item[k]] for k in uid_fields if isinstance(item.get(k), str) and item[k] in uid_map}
+            if hits:
+                item = {**item, **hits}
+        resolved.append(item)
                 
-    return items
+    return resolved
 
 # ---------------- Name Enrichment for Entity Lists ----------------
+# endpoint substring -> (by-id endpoint, id param); leftmost match in the endpoint wins
+ENRICH_ROUTES = {
+    "company": ("company.getById", "companyId"),
+    "country": ("country.getCountryById", "countryId"),
+    "region": ("region.getById", "regionId"),
+    "mu": ("mu.getById", "muId"),
+    "battle": ("battle.getById", "battleId"),
+}
+_ENRICH_RE = re.compile("|".join(map(re.escape, ENRICH_ROUTES)))
+
 async def enrich_entity_names(items: List[Any], endpoint: str) -> List[Dict]:
     """
     Enriches entity lists with full details (names, etc.) by making concurrent API calls.
@@ -434,44 +1051,33 @@ async def enrich_entity_names(items: List[Any], endpoint: str) -> List[Dict]:
     if not items:
         return items
     
-    is_company = "company" in endpoint.lower()
-    is_country = "country" in endpoint.lower()
-    is_region = "region" in endpoint.lower()
-    is_mu = "mu" in endpoint.lower()
-    is_battle = "battle" in endpoint.lower()
+    m = _ENRICH_RE.search(endpoint.lower())
+    if m is None:
+        return items
+    by_id, param = ENRICH_ROUTES[m.group()]
     
     ids_to_fetch = []
-    for item in items:
+    for idx, item in enumerate(items):
         if not isinstance(item, dict):
             continue
         
         item_id = item.get("_id") or item.get("id")
         if item_id and is_likely_id(item_id):
-            ids_to_fetch.append((item, item_id))
+            ids_to_fetch.append((idx, item_id))
     
     if not ids_to_fetch:
         return items
     
-    fetch_tasks = []
-    for item, item_id in ids_to_fetch:
-        if is_company:
-            fetch_tasks.append(war_api.call("company.getById", {"companyId": item_id}))
-        elif is_country:
-            fetch_tasks.append(war_api.call("country.getCountryById", {"countryId": item_id}))
-        elif is_region:
-            fetch_tasks.append(war_api.call("region.getById", {"regionId": item_id}))
-        elif is_mu:
-            fetch_tasks.append(war_api.call("mu.getById", {"muId": item_id}))
-        elif is_battle:
-            fetch_tasks.append(war_api.call("battle.getById", {"battleId": item_id}))
-        else:
-            fetch_tasks.append(None)
+    fetch_tasks = [war_api.call(by_id, {param: item_id}) for _, item_id in ids_to_fetch]
     
-    if fetch_tasks and any(t is not None for t in fetch_tasks):
+    # API payloads are shared through war_api's cache, so enrich into copies
+    items = list(items)
+    if fetch_tasks:
         results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
         
-        for (item, item_id), result in zip(ids_to_fetch, results):
+        for (idx, item_id), result in zip(ids_to_fetch, results):
             if isinstance(result, dict):
+                item = items[idx] = dict(items[idx])
                 item["name"] = result.get("name") or result.get("title") or item.get("name")
                 
                 if "avatarUrl" in result:
@@ -484,7 +1090,7 @@ async def enrich_entity_names(items: List[Any], endpoint: str) -> List[Dict]:
     return items
 
 # ---------------- Single Object Rendering ----------------
-def process_single_object(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def process_single_object(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """
     Process a single object into an embed, resolving key IDs to links and formatting values.
     """
@@ -516,7 +1122,7 @@ def process_single_object(data: Dict, title: str) -> Tuple[List[discord.Embed],
     # Fallback to generic renderer
     return render_generic_embed(data, title)
 
-def render_battle_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_battle_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render a battle entity with specialized formatting"""
     e = discord.Embed(title=f"⚔️ {title}", timestamp=now_utc(), color=discord.Color.red())
     
@@ -552,9 +1158,9 @@ def render_battle_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], Li
     if data.get("createdAt"):
         e.add_field(name="Started", value=format_date_iso(data.get("createdAt")), inline=False)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_article_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_article_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render an article entity with specialized formatting"""
     article_title = data.get("title") or title
     e = discord.Embed(title=f"📰 {article_title}", timestamp=now_utc(), color=discord.Color.blue())
@@ -581,9 +1187,9 @@ def render_article_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], L
     if data.get("publishedAt"):
         e.add_field(name="📅 Published", value=format_date_iso(data.get("publishedAt")), inline=False)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_company_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_company_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render a company entity with specialized formatting"""
     company_name = data.get("name") or title
     e = discord.Embed(title=f"🏢 {company_name}", timestamp=now_utc(), color=discord.Color.gold())
@@ -620,9 +1226,9 @@ def render_company_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], L
         status = "✅ Full" if data.get("isFull") else "🟢 Hiring"
         e.add_field(name="Status", value=status, inline=True)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_country_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_country_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render a country entity with specialized formatting"""
     country_name = data.get("name") or title
     e = discord.Embed(title=f"🌍 {country_name}", timestamp=now_utc(), color=discord.Color.green())
@@ -657,9 +1263,9 @@ def render_country_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], L
     if isinstance(regions, list):
         e.add_field(name="🏔️ Regions", value=str(len(regions)), inline=True)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_region_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_region_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render a region entity with specialized formatting"""
     region_name = data.get("name") or title
     e = discord.Embed(title=f"🏔️ {region_name}", timestamp=now_utc(), color=discord.Color.teal())
@@ -681,9 +1287,9 @@ def render_region_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], Li
     if data.get("resourceMultiplier"):
         e.add_field(name="📈 Multiplier", value=f"×{fmt_num(data.get('resourceMultiplier'))}", inline=True)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_mu_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_mu_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render a military unit entity with specialized formatting"""
     mu_name = data.get("name") or title
     e = discord.Embed(title=f"🎖️ {mu_name}", timestamp=now_utc(), color=discord.Color.purple())
@@ -707,9 +1313,9 @@ def render_mu_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[s
     if country_id and is_likely_id(country_id):
         e.add_field(name="🌍 Country", value=f"[View]({URLS['country']}{country_id})", inline=True)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_user_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_user_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Render a user entity with specialized formatting"""
     user_name = data.get("name") or data.get("username") or title
     e = discord.Embed(title=f"👤 {user_name}", timestamp=now_utc(), color=discord.Color.blue())
@@ -740,9 +1346,9 @@ def render_user_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List
     if country_id and is_likely_id(country_id):
         e.add_field(name="🌍 Country", value=f"[View]({URLS['country']}{country_id})", inline=True)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
-def render_generic_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], List[str]]:
+def render_generic_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], DevJsonPages]:
     """Fallback generic renderer"""
     e = discord.Embed(title=title, timestamp=now_utc(), color=discord.Color.blue())
     
@@ -808,20 +1414,19 @@ def render_generic_embed(data: Dict, title: str) -> Tuple[List[discord.Embed], L
 
             processed_fields[k] = v_str
     
-    field_keys = list(processed_fields.keys())
-    for k in field_keys:
-        field_name = safe_truncate(str(k), 25) 
-        e.add_field(name=field_name, value=processed_fields[k], inline=True)
+    for k, v_str in processed_fields.items():
+        field_name = safe_truncate(str(k), 25)
+        e.add_field(name=field_name, value=v_str, inline=True)
     
-    return [e], [json.dumps(data, default=str)]
+    return [e], DevJsonPages([data])
 
 # ---------------- Render endpoint to pages ----------------
-async def render_endpoint_to_pages(endpoint:str, params:Optional[Dict]=None, title_override:str=None, enrich_names:bool=True) -> Tuple[List[discord.Embed], List[str]]:
+async def render_endpoint_to_pages(endpoint:str, params:Optional[Dict]=None, title_override:str=None, enrich_names:bool=True) -> Tuple[Sequence[discord.Embed], Sequence[str]]:
     data = await war_api.call(endpoint, params)
     display_title = title_override or endpoint
     
     if data is None:
-        return [discord.Embed(title=display_title, description="❌ Failed to fetch data", color=discord.Color.red(), timestamp=now_utc())], [json.dumps({"error":"fetch failed"})]
+        return [discord.Embed(title=display_title, description="❌ Failed to fetch data", color=discord.Color.red(), timestamp=now_utc())], DevJsonPages([{"error": "fetch failed"}])
     
     if isinstance(data, dict):
         for list_key in ("items","results","data","countries","regions","battles","companies","users"):
@@ -832,7 +1437,7 @@ async def render_endpoint_to_pages(endpoint:str, params:Optional[Dict]=None, tit
                     items = await enrich_entity_names(items, endpoint)
                 
                 items = await resolve_user_names_in_list(items)
-                icon = get_entity_icon(items[0] if items else {})
+                icon = ENDPOINT_ICON.get(endpoint) or get_entity_icon(items[0] if items else {})
                 return items_to_paginated_embeds(items, display_title, icon)
         
         return process_single_object(data, display_title)
@@ -844,19 +1449,20 @@ async def render_endpoint_to_pages(endpoint:str, params:Optional[Dict]=None, tit
             items = await enrich_entity_names(items, endpoint)
         
         items = await resolve_user_names_in_list(items)
-        icon = get_entity_icon(items[0] if items else {})
+        icon = ENDPOINT_ICON.get(endpoint) or get_entity_icon(items[0] if items else {})
         return items_to_paginated_embeds(items, display_title, icon)
     
-    return [discord.Embed(title=display_title, description=safe_truncate(str(data),1000), timestamp=now_utc())], [json.dumps(data, default=str)]
+    return [discord.Embed(title=display_title, description=safe_truncate(str(data),1000), timestamp=now_utc())], DevJsonPages([data])
 
 # ---------------- Leaderboard View ----------------
 class LeaderboardView(View):
-    def __init__(self, pages: List[discord.Embed], dev_json: List[str], *, timeout:int=300):
+    def __init__(self, pages: Sequence[discord.Embed], dev_json: Sequence[str], *, timeout:int=300):
         super().__init__(timeout=timeout)
         self.pages = pages
         self.dev_json = dev_json
         self.idx = 0
         self.mode = "game"
+        self._dev_embed: Optional[discord.Embed] = None
         
         self.prev = Button(emoji="◀️", style=discord.ButtonStyle.secondary)
         self.toggle = Button(label="🧠 Dev View", style=discord.ButtonStyle.primary)
@@ -902,12 +1508,13 @@ class LeaderboardView(View):
             emb = self.pages[self.idx]
         else:
             j = self.dev_json[self.idx] if self.idx < len(self.dev_json) else "{}"
-            emb = discord.Embed(
-                title=f"🧠 Dev JSON (page {self.idx+1})", 
-                description=f"```json\n{j[:1800]}\n```", 
-                timestamp=now_utc(), 
-                color=discord.Color.dark_grey()
-            )
+            # one dev embed per view, re-pointed at the current page
+            emb = self._dev_embed
+            if emb is None:
+                emb = self._dev_embed = discord.Embed(color=discord.Color.dark_grey())
+            emb.title = f"🧠 Dev JSON (page {self.idx+1})"
+            emb.description = f"```json\n{j[:1800]}\n```"
+            emb.timestamp = now_utc()
         
         self._update_buttons()
         try:
@@ -935,13 +1542,10 @@ async def send_endpoint_pages(interaction: discord.Interaction, endpoint: str, p
 
 # ==================== SLASH COMMANDS ====================
 
-@tree.command(name="help", description="📖 Show all available commands")
-async def help_cmd(interaction: discord.Interaction):
-    await safe_defer(interaction)
+def build_help_embed() -> discord.Embed:
     e = discord.Embed(
         title="🎮 WarEra Bot — Command Guide", 
-        color=discord.Color.gold(), 
-        timestamp=now_utc()
+        color=discord.Color.gold()
     )
     e.description = "Comprehensive WarEra game data at your fingertips!\n*Use slash commands: type `/` to see all*"
     
@@ -1008,7 +1612,15 @@ async def help_cmd(interaction: discord.Interaction):
     )
     
     e.set_footer(text="WarEra Bot | Powered by api2.warera.io")
-    await interaction.followup.send(embed=e)
+    return e
+
+# static: built once, only the timestamp is set per /help
+HELP_EMBED = build_help_embed()
+
+@tree.command(name="help", description="📖 Show all available commands")
+async def help_cmd(interaction: discord.Interaction):
+    HELP_EMBED.timestamp = now_utc()
+    await interaction.response.send_message(embed=HELP_EMBED)
 
 # ==================== RANKING COMMANDS ====================
 
@@ -1035,97 +1647,122 @@ async def rankings_cmd(interaction: discord.Interaction, ranking_type: app_comma
     )
 
 # Aggregated rankings
-async def aggregate_users_from_ranking(ranking_type: str, limit: int = 500) -> List[Tuple[str, float, Dict]]:
-    """Returns list of (user_id, value, user_data). Limit controls how many to return."""
-    sums: Dict[str, float] = {}
-    user_data: Dict[str, Dict] = {}
-    
+# names resolved before a top* command replies (its first two pages); the rest load in the background
+RANKING_EAGER_NAMES = 20
+_name_tasks: set = set()
+
+def _name_task_done(task: asyncio.Task):
+    _name_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("[names] background name lookup failed: %r", task.exception())
+
+async def apply_user_names(user_data: Dict[str, Dict], uids: List[str]):
+    """Patch getUserLite names/avatars into the rows in user_data (and their nested "user" objects)."""
+    results = await fetch_users_lite(uids)
+    for uid, r in zip(uids, results):
+        if isinstance(r, dict):
+            row = user_data[uid]
+            row["name"] = r.get("name") or r.get("username")
+            row["avatarUrl"] = r.get("avatarUrl") or r.get("animatedAvatarUrl")
+            u = row.get("user")
+            if isinstance(u, dict):
+                u["name"], u["avatarUrl"] = row["name"], row["avatarUrl"]
+
+async def aggregate_users_from_ranking(ranking_type: str, limit: int = 500, eager_names: Optional[int] = None) -> Tuple[List[Tuple[str, float, Dict]], Optional[asyncio.Task]]:
+    """Returns (list of (user_id, value, user_data), names task). Limit controls how many to return.
+    
+    Only the first eager_names users (all by default) are named before returning; the rest are
+    patched into their user_data rows by the returned background task (None if there is nothing left)."""
     data = await war_api.call("ranking.getRanking", {"rankingType": ranking_type})
-    items = []
-    if isinstance(data, dict) and isinstance(data.get("items"), list):
-        items = data["items"]
-    elif isinstance(data, list):
-        items = data
+    items = coerce_items(data)
     
+    # read only the id/value keys from each row; the per-user sums happen in numpy below
+    uids: List[str] = []
+    vals: List[float] = []
+    rows: List[Dict] = []
     for it in items:
-        if isinstance(it, dict):
-            uid = it.get("user") or it.get("_id") or it.get("id")
-            val = it.get("value") or it.get("damage") or it.get("score") or it.get("wealth") or 0
-            if uid is None: 
-                continue
-            try: 
-                sums[str(uid)] = sums.get(str(uid), 0.0) + float(val)
-                if str(uid) not in user_data:
-                    user_data[str(uid)] = it
-            except: 
-                pass
-    
-    sorted_users = sorted(sums.items(), key=lambda kv: kv[1], reverse=True)
-    
-    fetch_limit = min(limit, len(sorted_users))
-    uids_to_fetch = [uid for uid, _ in sorted_users[:fetch_limit]]
-    
-    fetch_tasks = [war_api.call("user.getUserLite", {"userId": uid}) for uid in uids_to_fetch]
-        
-    results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
-    
-    for uid, r in zip(uids_to_fetch, results):
-        if isinstance(r, dict):
-            user_data[uid]["name"] = r.get("name") or r.get("username")
-            user_data[uid]["avatarUrl"] = r.get("avatarUrl") or r.get("animatedAvatarUrl")
-
-    return [(uid, val, user_data.get(uid, {})) for uid, val in sorted_users[:limit]]
-
-def ranking_list_to_pages(title: str, ranked: List[Tuple[str, float, Dict]]) -> Tuple[List[discord.Embed], List[str]]:
+        if not isinstance(it, dict):
+            continue
+        uid = it.get("user") or it.get("_id") or it.get("id")
+        if uid is None: 
+            continue
+        try: 
+            val = float(it.get("value") or it.get("damage") or it.get("score") or it.get("wealth") or 0)
+        except (TypeError, ValueError): 
+            continue
+        uids.append(str(uid))
+        vals.append(val)
+        rows.append(it)
+    if not uids:
+        return [], None
+    
+    uniq, first, inv = np.unique(np.array(uids), return_index=True, return_inverse=True)
+    sums = np.bincount(inv, weights=np.array(vals, dtype=np.float64), minlength=len(uniq))
+    # highest total first; ties keep ranking order (first appearance), like a stable sort
+    order = np.lexsort((first, -sums))[:limit]
+    
+    top_uids = [str(uniq[i]) for i in order]
+    # the ranking payload is the shared cached object: copy the first row per shown user,
+    # since it gets names patched in below
+    user_data = {uid: rows[first[i]].copy() for uid, i in zip(top_uids, order)}
+    
+    eager = len(top_uids) if eager_names is None else eager_names
+    await apply_user_names(user_data, top_uids[:eager])
+    task = None
+    if top_uids[eager:]:
+        task = asyncio.create_task(apply_user_names(user_data, top_uids[eager:]))
+        _name_tasks.add(task)
+        task.add_done_callback(_name_task_done)
+
+    return [(uid, float(sums[i]), user_data[uid]) for uid, i in zip(top_uids, order)], task
+
+def ranking_list_to_pages(title: str, ranked: List[Tuple[str, float, Dict]], icon: str = ICON_USER, pending: Optional[asyncio.Future] = None) -> Tuple[EmbedPages, DevJsonPages]:
+    # the rows are aggregate_users_from_ranking's own copies; they are used as the page items
+    # directly so names it resolves in the background still show up on later pages
     items = []
     for uid, val, udata in ranked:
-        item = udata.copy()
-        item["user"] = udata.get("user") or {"_id": uid, "name": udata.get("name"), "avatarUrl": udata.get("avatarUrl")}
-        item["value"] = val
-        items.append(item)
+        udata["user"] = udata.get("user") or {"_id": uid, "name": udata.get("name"), "avatarUrl": udata.get("avatarUrl")}
+        udata["value"] = val
+        items.append(udata)
         
-    icon = get_entity_icon(items[0] if items else {})
-    return items_to_paginated_embeds(items, title, icon)
+    return items_to_paginated_embeds(items, title, icon, pending)
+
+# rankingType -> (page title, icon) for the aggregated top* commands
+TOP_USER_RANKINGS = {
+    "userDamages": (f"{ICON_DAMAGE} Top Damage Dealers", ICON_DAMAGE),
+    "userWealth": (f"{ICON_WEALTH} Top Wealth", ICON_WEALTH),
+    "userTerrain": (f"{ICON_GROUND} Top Land Producers", ICON_GROUND),
+    "userLevel": (f"{ICON_LEVEL} Highest Levels", ICON_LEVEL),
+    "userReferrals": (f"{ICON_REFERRAL} Top Referrers", ICON_REFERRAL),
+}
 
-@tree.command(name="topdamage", description="⚔️ Top damage dealers (aggregated)")
-async def topdamage_cmd(interaction: discord.Interaction):
+async def send_top_users(interaction: discord.Interaction, ranking_type: str):
     await safe_defer(interaction)
-    ranked = await aggregate_users_from_ranking("userDamages", limit=500)
-    pages, dev = ranking_list_to_pages(f"{ICON_DAMAGE} Top Damage Dealers", ranked)
+    title, icon = TOP_USER_RANKINGS[ranking_type]
+    ranked, names = await aggregate_users_from_ranking(ranking_type, limit=500, eager_names=RANKING_EAGER_NAMES)
+    pages, dev = ranking_list_to_pages(title, ranked, icon, names)
     view = LeaderboardView(pages, dev)
     await interaction.followup.send(embed=pages[0], view=view)
 
+@tree.command(name="topdamage", description="⚔️ Top damage dealers (aggregated)")
+async def topdamage_cmd(interaction: discord.Interaction):
+    await send_top_users(interaction, "userDamages")
+
 @tree.command(name="topwealth", description="💰 Wealthiest players (aggregated)")
 async def topwealth_cmd(interaction: discord.Interaction):
-    await safe_defer(interaction)
-    ranked = await aggregate_users_from_ranking("userWealth", limit=500)
-    pages, dev = ranking_list_to_pages(f"{ICON_WEALTH} Top Wealth", ranked)
-    view = LeaderboardView(pages, dev)
-    await interaction.followup.send(embed=pages[0], view=view)
+    await send_top_users(interaction, "userWealth")
 
 @tree.command(name="topland", description="🌾 Top land producers (aggregated)")
 async def topland_cmd(interaction: discord.Interaction):
-    await safe_defer(interaction)
-    ranked = await aggregate_users_from_ranking("userTerrain", limit=500)
-    pages, dev = ranking_list_to_pages(f"{ICON_GROUND} Top Land Producers", ranked)
-    view = LeaderboardView(pages, dev)
-    await interaction.followup.send(embed=pages[0], view=view)
+    await send_top_users(interaction, "userTerrain")
 
 @tree.command(name="toplevel", description="⭐ Highest level players")
 async def toplevel_cmd(interaction: discord.Interaction):
-    await safe_defer(interaction)
-    ranked = await aggregate_users_from_ranking("userLevel", limit=500)
-    pages, dev = ranking_list_to_pages(f"{ICON_LEVEL} Highest Levels", ranked)
-    view = LeaderboardView(pages, dev)
-    await interaction.followup.send(embed=pages[0], view=view)
+    await send_top_users(interaction, "userLevel")
 
 @tree.command(name="topreferrals", description="🔗 Top referrers")
 async def topreferrals_cmd(interaction: discord.Interaction):
-    await safe_defer(interaction)
-    ranked = await aggregate_users_from_ranking("userReferrals", limit=500)
-    pages, dev = ranking_list_to_pages(f"{ICON_REFERRAL} Top Referrers", ranked)
-    view = LeaderboardView(pages, dev)
-    await interaction.followup.send(embed=pages[0], view=view)
+    await send_top_users(interaction, "userReferrals")
 
 # ==================== COUNTRY COMMANDS ====================
 
@@ -1149,29 +1786,17 @@ async def topcountries_cmd(interaction: discord.Interaction, metric: app_command
     await safe_defer(interaction)
     data = await war_api.call("country.getAllCountries")
     
-    countries = []
-    if isinstance(data, dict) and "countries" in data:
-        countries = data["countries"]
-    elif isinstance(data, list):
-        countries = data
+    countries = coerce_items(data, "countries")
     
     if not metric or metric.value == "combined":
         # Original: GDP + Treasury
-        scored = []
-        for c in countries:
-            if isinstance(c, dict):
-                gdp = c.get("gdp") or 0
-                treasury = c.get("treasury") or 0
-                try:
-                    score = float(gdp) + float(treasury)
-                    new_c = c.copy()
-                    new_c["value"] = score
-                    scored.append(new_c)
-                except:
-                    pass
-        
-        scored.sort(key=lambda x: x["value"], reverse=True)
-        pages, dev = items_to_paginated_embeds(scored[:100], "🏆 Top Countries (GDP + Treasury)", ICON_COUNTRY)
+        scored = [
+            (gdp + treasury, c) for c in countries if isinstance(c, dict)
+            if (gdp := as_float(c.get("gdp") or 0)) is not None and (treasury := as_float(c.get("treasury") or 0)) is not None
+        ]
+        # only the shown rows are copied (the country list is the cached API payload)
+        top = [{**c, "value": score} for score, c in nlargest(100, scored, key=itemgetter(0))]
+        pages, dev = items_to_paginated_embeds(top, "🏆 Top Countries (GDP + Treasury)", ICON_COUNTRY)
     
     elif metric.value == "avg_wealth":
         # Average citizen wealth per country
@@ -1207,11 +1832,10 @@ async def topcountries_cmd(interaction: discord.Interaction, metric: app_command
         scored.sort(key=lambda x: x["value"], reverse=True)
         
         # Custom embed for average wealth
-        items_for_display = []
-        for c in scored[:50]:
-            c_display = c.copy()
-            c_display["tier"] = f"Avg: ${fmt_num(c['value'])} ({c['citizen_count']} citizens)"
-            items_for_display.append(c_display)
+        items_for_display = [
+            {**c, "tier": f"Avg: ${fmt_num(c['value'])} ({c['citizen_count']} citizens)"}
+            for c in islice(scored, 50)
+        ]
         
         pages, dev = items_to_paginated_embeds(items_for_display, "💎 Top Countries by Avg Citizen Wealth", ICON_COUNTRY)
     
@@ -1250,11 +1874,10 @@ async def topcountries_cmd(interaction: discord.Interaction, metric: app_command
         scored.sort(key=lambda x: x["value"], reverse=True)
         
         # Custom embed for total wealth
-        items_for_display = []
-        for c in scored[:50]:
-            c_display = c.copy()
-            c_display["tier"] = f"Total: ${fmt_num(c['value'])} ({c['citizen_count']} citizens)"
-            items_for_display.append(c_display)
+        items_for_display = [
+            {**c, "tier": f"Total: ${fmt_num(c['value'])} ({c['citizen_count']} citizens)"}
+            for c in islice(scored, 50)
+        ]
         
         pages, dev = items_to_paginated_embeds(items_for_display, "📊 Top Countries by Total Citizen Wealth", ICON_COUNTRY)
     
@@ -1274,8 +1897,8 @@ async def regions_cmd(interaction: discord.Interaction, country_id: str = None):
         if isinstance(data, dict):
             for region_id, region_data in data.items():
                 if isinstance(region_data, dict) and region_data.get("countryId") == country_id:
-                    region_data["_id"] = region_id
-                    filtered_regions.append(region_data)
+                    # region_data belongs to the cached payload; tag a copy with its id
+                    filtered_regions.append({**region_data, "_id": region_id})
         
         if not filtered_regions:
             await interaction.followup.send(f"❌ No regions found for country ID: {country_id}", ephemeral=True)
@@ -1301,11 +1924,7 @@ async def topmu_cmd(interaction: discord.Interaction):
     await safe_defer(interaction)
     res = await war_api.call("mu.getManyPaginated", {"page":1,"limit":200})
     
-    items = []
-    if isinstance(res, dict) and isinstance(res.get("items"), list): 
-        items = res["items"]
-    elif isinstance(res, list): 
-        items = res
+    items = coerce_items(res)
     
     scored = []
     for mu in items:
@@ -1370,49 +1989,17 @@ async def prices_cmd(interaction: discord.Interaction):
     await safe_defer(interaction)
     data = await war_api.call("itemTrading.getPrices")
     
-    e = discord.Embed(title="💰 Item Market Prices", color=discord.Color.gold(), timestamp=now_utc())
-    e.description = "Current trading prices for all items"
-    
-    item_icons = {
-        "cocain": "💊", "cocaine": "💊",
-        "case1": "📦", "case": "📦",
-        "cookedFish": "🍣", "fish": "🐟",
-        "steak": "🥩", "livestock": "🐄",
-        "bread": "🍞", "grain": "🌾",
-        "steel": "⚙️", "iron": "⛏️",
-        "concrete": "🧱", "limestone": "🪨",
-        "oil": "🛢️", "petroleum": "⛽",
-        "ammo": "💣", "heavyAmmo": "💥", "lightAmmo": "🔫",
-        "lead": "🔩", "coca": "🌿",
-        "diamonds": "💎", "gold": "🥇", "silver": "🥈", "copper": "🥉"
-    }
-
-    items_list = []
     if isinstance(data, dict):
-        for k, v in data.items():
-            items_list.append({
-                "name": k.replace("_", " ").title(),
-                "price": v,
-                "value": v,
-                "_id": k
-            })
-        
-        items_list.sort(key=lambda x: float(x["price"]) if isinstance(x["price"], (int, float)) else 0, reverse=True)
-        
-        for item in items_list[:25]:
-            icon = item_icons.get(item["_id"], "📊")
-            e.add_field(
-                name=f"{icon} {safe_truncate(item['name'], 20)}", 
-                value=f"**${fmt_num(item['price'])}**", 
-                inline=True
-            )
-        
+        items_list = [
+            {"name": k.replace("_", " ").title(), "price": v, "value": v, "_id": k}
+            for k, v in sorted_prices(data)
+        ]
         pages, dev_json = items_to_paginated_embeds(items_list, "💰 Item Market Prices", ICON_WEALTH)
-        
     else:
+        e = discord.Embed(title="💰 Item Market Prices", color=discord.Color.gold(), timestamp=now_utc())
         e.description = safe_truncate(str(data), 1000)
         pages = [e]
-        dev_json = [json.dumps(data, default=str)]
+        dev_json = DevJsonPages([data])
     
     view = LeaderboardView(pages, dev_json)
     await interaction.followup.send(embed=pages[0], view=view)
@@ -1463,15 +2050,14 @@ class JsonModal(Modal):
         self.add_item(self.input)
     
     async def on_submit(self, interaction: discord.Interaction):
-        await safe_defer(interaction, ephemeral=True)
         try:
-            parsed = json.loads(self.input.value)
-            text = json.dumps(parsed, indent=2, default=str)
+            parsed = jloads(self.input.value)
+            text = jdumps(parsed, indent=True)
             if len(text) > 1900: 
                 text = text[:1897] + "..."
-            await interaction.followup.send(f"```json\n{text}\n```", ephemeral=True)
+            await interaction.response.send_message(f"```json\n{text}\n```", ephemeral=True)
         except Exception as e:
-            await interaction.followup.send(f"❌ Invalid JSON: {e}", ephemeral=True)
+            await interaction.response.send_message(f"❌ Invalid JSON: {e}", ephemeral=True)
 
 @tree.command(name="jsondebug", description="🧪 Format JSON code")
 async def jsondebug_cmd(interaction: discord.Interaction):
@@ -1480,71 +2066,125 @@ async def jsondebug_cmd(interaction: discord.Interaction):
 
 # ==================== MONITOR & ALERTS ----------------
 
-@dataclass
-class Alert:
-    ts: str
-    level: str
-    category: str
-    title: str
-    message: str
-    data: Dict = field(default_factory=dict)
+LVL_CRITICAL = sys.intern("CRITICAL")
+LVL_WARNING = sys.intern("WARNING")
+LVL_INFO = sys.intern("INFO")
+CAT_ECONOMY = sys.intern("ECONOMY")
+CAT_BATTLE = sys.intern("BATTLE")
+CAT_RANKING = sys.intern("RANKING")
+
+LEVEL_COLOR = {
+    LVL_CRITICAL: discord.Color.red(),
+    LVL_WARNING: discord.Color.gold(),
+    LVL_INFO: discord.Color.blue(),
+}
+
+# alerts are plain dicts end to end: scan_once output, monitor.alerts and state["monitor_alerts"]
+Alert = Dict[str, Any]
+
+def make_alert(ts: str, level: str, category: str, title: str, message: str, data: Optional[Dict] = None) -> Alert:
+    return {"ts": ts, "level": level, "category": category, "title": title, "message": message, "data": data}
+
+def battle_ids(battles: List[Any]) -> frozenset:
+    return frozenset(bid for b in battles if isinstance(b, dict) and (bid := b.get("_id") or b.get("id")))
 
 class Monitor:
     def __init__(self, api: WarEraAPI):
         self.api = api
         self.prev = state.get("monitor_prev", {})
-        self.alerts = state.get("monitor_alerts", [])
+        self.alerts = deque(state.get("monitor_alerts", []), maxlen=MAX_ALERTS)
         self.running = False
-        self.interval = DEFAULT_DASH_INTERVAL
+        # an interval set through IntervalModal survives restarts
+        self.interval = state.get("dash_interval") or DEFAULT_DASH_INTERVAL
         self.price_threshold = 20.0
         self.critical = 50.0
+        self._digests: Dict[str, bytes] = {}
+        # numeric price vector from the last diffed tick, aligned with _price_keys
+        self._price_keys: List[str] = []
+        self._price_vals = np.empty(0, dtype=np.float64)
+        self._prev_battle_ids: Optional[frozenset] = None
 
     async def scan_once(self) -> List[Alert]:
         out: List[Alert] = []
+        ts = now_utc().isoformat()
+        
+        results = await asyncio.gather(
+            self.api.call("itemTrading.getPrices"),
+            self.api.call("battle.getBattles"),
+            self.api.call("ranking.getRanking", {"rankingType": "userDamages"}),
+            return_exceptions=True
+        )
+        prices, battles, ranking = (None if isinstance(r, BaseException) else r for r in results)
+        
+        # skip the per-key diffs for any snapshot whose digest matches the previous tick
+        digests = {
+            k: snapshot_digest(v) for k, v in (
+                ("itemTrading.getPrices", prices),
+                ("battle.getBattles", battles),
+                ("ranking.getRanking.userDamages", ranking),
+            ) if v is not None
+        }
+        changed = {k for k, d in digests.items() if self._digests.get(k) != d}
+        self._digests.update(digests)
         
-        prices = await self.api.call("itemTrading.getPrices")
         prev_prices = self.prev.get("itemTrading.getPrices")
-        if isinstance(prices, dict) and isinstance(prev_prices, dict):
-            for k, v in prices.items():
-                if isinstance(v, (int, float)) and isinstance(prev_prices.get(k), (int, float)):
-                    old = prev_prices.get(k)
-                    if old != 0:
-                        change = ((v - old) / abs(old)) * 100.0
-                        if abs(change) >= self.price_threshold:
-                            lvl = "CRITICAL" if abs(change) >= self.critical else "WARNING"
-                            out.append(Alert(
-                                now_utc().isoformat(), 
-                                lvl, 
-                                "ECONOMY", 
-                                f"Price {k}", 
-                                f"{fmt_num(old)} → {fmt_num(v)} ({change:+.2f}%)", 
-                                {"old": old, "new": v, "pct": change}
-                            ))
+        if "itemTrading.getPrices" in changed and isinstance(prices, dict) and isinstance(prev_prices, dict):
+            keys = [k for k, v in prices.items() if isinstance(v, (int, float))]
+            new_vals = np.fromiter((prices[k] for k in keys), dtype=np.float64, count=len(keys))
+            if keys == self._price_keys:
+                old_vals = self._price_vals
+            else:
+                old_vals = np.fromiter(
+                    (v if isinstance(v := prev_prices.get(k), (int, float)) else np.nan for k in keys),
+                    dtype=np.float64, count=len(keys)
+                )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pct = (new_vals - old_vals) / np.abs(old_vals) * 100.0
+            hits = np.flatnonzero((old_vals != 0) & (np.abs(pct) >= self.price_threshold))
+            self._price_keys, self._price_vals = keys, new_vals
+            
+            for i in hits:
+                k = keys[i]
+                old, v, change = prev_prices[k], prices[k], float(pct[i])
+                lvl = LVL_CRITICAL if abs(change) >= self.critical else LVL_WARNING
+                out.append(make_alert(
+                    ts, 
+                    lvl, 
+                    CAT_ECONOMY, 
+                    f"Price {k}", 
+                    f"{fmt_num(old)} → {fmt_num(v)} ({change:+.2f}%)", 
+                    {"old": old, "new": v, "pct": change}
+                ))
         
-        battles = await self.api.call("battle.getBattles")
         prev_battles = self.prev.get("battle.getBattles")
-        if isinstance(battles, list) and isinstance(prev_battles, list):
-            if len(battles) > len(prev_battles):
-                out.append(Alert(
-                    now_utc().isoformat(), 
-                    "WARNING", 
-                    "BATTLE", 
+        if "battle.getBattles" in changed and isinstance(battles, list) and isinstance(prev_battles, list):
+            # diff by id so a battle that replaces an ended one still counts as new
+            if self._prev_battle_ids is None:
+                self._prev_battle_ids = battle_ids(prev_battles)
+            new_ids = battle_ids(battles)
+            added = new_ids - self._prev_battle_ids
+            self._prev_battle_ids = new_ids
+            if added:
+                out.append(make_alert(
+                    ts, 
+                    LVL_WARNING, 
+                    CAT_BATTLE, 
                     "New battles", 
-                    f"+{len(battles) - len(prev_battles)} battles started"
+                    f"+{len(added)} battles started"
                 ))
         
-        ranking = await self.api.call("ranking.getRanking", {"rankingType": "userDamages"})
         prev_rank = self.prev.get("ranking.getRanking.userDamages")
         try:
             new_top = (ranking.get("items") or [None])[0] if isinstance(ranking, dict) else None
             old_top = (prev_rank.get("items") or [None])[0] if isinstance(prev_rank, dict) else None
-            if isinstance(new_top, dict) and isinstance(old_top, dict) and new_top.get("_id") != old_top.get("_id"):
+            if ("ranking.getRanking.userDamages" in changed and isinstance(new_top, dict) and isinstance(old_top, dict)
+                    and new_top.get("_id") != old_top.get("_id")):
                 old_name = old_top.get("name") or old_top.get("user") or old_top.get("_id")
                 new_name = new_top.get("name") or new_top.get("user") or new_top.get("_id")
-                out.append(Alert(
-                    now_utc().isoformat(), 
-                    "INFO", 
-                    "RANKING", 
+                out.append(make_alert(
+                    ts, 
+                    LVL_INFO, 
+                    CAT_RANKING, 
                     "Top damage changed", 
                     f"{old_name} → {new_name}"
                 ))
@@ -1556,25 +2196,73 @@ class Monitor:
         self.prev["ranking.getRanking.userDamages"] = ranking if ranking is not None else prev_rank
         state["monitor_prev"] = self.prev
         
-        for a in out:
-            state_alert = {
-                "ts": a.ts, 
-                "level": a.level, 
-                "category": a.category, 
-                "title": a.title, 
-                "message": a.message, 
-                "data": a.data
-            }
-            self.alerts.insert(0, state_alert)
+        for k in changed:
+            log_state_op({"op": "prev", "k": k, "v": self.prev[k]})
         
-        state["monitor_alerts"] = self.alerts[:400]
-        await save_state()
+        for a in out:
+            self.alerts.appendleft(a)
+            log_state_op({"op": "alert_add", "a": a})
         return out
 
 monitor = Monitor(war_api)
 
+DM_CONCURRENCY = 5
+DM_USER_CACHE_MAX = 1024
+_dm_users: "OrderedDict[str, Any]" = OrderedDict()
+
+async def resolve_user(uid: str):
+    """bot.get_user (in-memory) first, then a small LRU of fetched users, then fetch_user."""
+    user = bot.get_user(int(uid))
+    if user is not None:
+        return user
+    user = _dm_users.get(uid)
+    if user is not None:
+        _dm_users.move_to_end(uid)
+        return user
+    user = _dm_users[uid] = await bot.fetch_user(int(uid))
+    if len(_dm_users) > DM_USER_CACHE_MAX:
+        _dm_users.popitem(last=False)
+    return user
+
+def pack_lines(lines: List[str], limit: int = 2000) -> List[str]:
+    """Group lines into as few messages as fit Discord's content limit."""
+    chunks: List[str] = []
+    cur = ""
+    for line in lines:
+        line = safe_truncate(line, limit)
+        if cur and len(cur) + 1 + len(line) > limit:
+            chunks.append(cur)
+            cur = line
+        else:
+            cur = f"{cur}\n{line}" if cur else line
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+async def notify_subscribers(alerts: List[Alert]):
+    """DM every subscriber one summary of this scan's alerts, a few users at a time."""
+    subs = list(alert_subscribers)
+    if not subs:
+        return
+    messages = pack_lines([f"🚨 {a['title']}: {a['message']}" for a in alerts])
+    sem = asyncio.Semaphore(DM_CONCURRENCY)
+    
+    async def send(uid: str):
+        async with sem:
+            try:
+                user = await resolve_user(uid)
+                for m in messages:
+                    await user.send(m)
+            except Exception:
+                pass
+    
+    await asyncio.gather(*(send(uid) for uid in subs))
+
+_alert_channel: Optional[discord.abc.Messageable] = None
+
 @tasks.loop(seconds=DEFAULT_DASH_INTERVAL)
 async def monitor_loop():
+    global _alert_channel
     try:
         if monitor.interval != monitor_loop.seconds:
             monitor_loop.change_interval(seconds=monitor.interval)
@@ -1587,42 +2275,38 @@ async def monitor_loop():
     try:
         alerts = await monitor.scan_once()
         if alerts:
-            if ALERT_CHANNEL_ID:
-                ch = bot.get_channel(int(ALERT_CHANNEL_ID))
+            if ALERT_CHANNEL_ID_INT:
+                if _alert_channel is None:
+                    _alert_channel = bot.get_channel(ALERT_CHANNEL_ID_INT)
+                ch = _alert_channel
                 if ch:
-                    summary = f"**🚨 WarEra Monitor — {len(alerts)} alerts**\n"
-                    by_cat = {}
-                    for a in alerts:
-                        by_cat.setdefault(a.category, 0)
-                        by_cat[a.category] += 1
-                    for c, cnt in by_cat.items(): 
-                        summary += f"• {c}: {cnt}\n"
+                    by_cat = Counter(a["category"] for a in alerts)
+                    summary = f"**🚨 WarEra Monitor — {len(alerts)} alerts**\n" + "".join(f"• {c}: {cnt}\n" for c, cnt in by_cat.items())
                     await ch.send(summary)
                     
-                    for a in alerts[:12]:
-                        color = (discord.Color.red() if a.level == "CRITICAL" else 
-                                (discord.Color.gold() if a.level == "WARNING" else discord.Color.blue()))
+                    # alerts from one scan share a timestamp; parse each distinct one once
+                    stamps: Dict[str, datetime] = {}
+                    for a in islice(alerts, 12):
+                        color = LEVEL_COLOR.get(a["level"], LEVEL_COLOR[LVL_INFO])
+                        stamp = stamps.get(a["ts"])
+                        if stamp is None:
+                            stamp = stamps[a["ts"]] = datetime.fromisoformat(a["ts"])
                         emb = discord.Embed(
-                            title=f"{a.level} {a.category} — {a.title}", 
-                            description=a.message, 
-                            timestamp=datetime.fromisoformat(a.ts), 
+                            title=f"{a['level']} {a['category']} — {a['title']}", 
+                            description=a["message"], 
+                            timestamp=stamp, 
                             color=color
                         )
-                        for k, v in (a.data or {}).items():
-                            emb.add_field(name=str(k), value=safe_truncate(json.dumps(v, default=str), 256), inline=True)
+                        for k, v in (a["data"] or {}).items():
+                            emb.add_field(name=str(k), value=safe_truncate(jdumps(v), 256), inline=True)
                         await ch.send(embed=emb)
             
-            subs = state.get("alerts_subscribers", [])
-            for a in alerts:
-                for uid in subs:
-                    try:
-                        user = await bot.fetch_user(int(uid))
-                        if user:
-                            await user.send(f"🚨 {a.title}: {a.message}")
-                    except Exception:
-                        pass
+            await notify_subscribers(alerts)
+    except (discord.NotFound, discord.Forbidden) as e:
+        _alert_channel = None
+        log.error("[monitor_loop] error: %s", e)
     except Exception as e:
-        print("[monitor_loop] error:", e)
+        log.error("[monitor_loop] error: %s", e)
 
 @tree.command(name="alerts", description="🔔 Manage alert subscriptions")
 @app_commands.describe(action="subscribe, unsubscribe, or list")
@@ -1632,32 +2316,29 @@ async def monitor_loop():
     app_commands.Choice(name="List Subscribers", value="list"),
 ])
 async def alerts_cmd(interaction: discord.Interaction, action: app_commands.Choice[str]):
-    await safe_defer(interaction, ephemeral=True)
     uid = str(interaction.user.id)
-    subs = state.get("alerts_subscribers", [])
+    subs = alert_subscribers
     
     if action.value == "subscribe":
         if uid in subs:
-            await interaction.followup.send("You are already subscribed to alerts.", ephemeral=True)
+            await interaction.response.send_message("You are already subscribed to alerts.", ephemeral=True)
             return
-        subs.append(uid)
-        state["alerts_subscribers"] = subs
-        await save_state()
-        await interaction.followup.send("✅ Subscribed to alerts (DM).", ephemeral=True)
+        subs.add(uid)
+        log_state_op({"op": "sub_add", "uid": uid})
+        await interaction.response.send_message("✅ Subscribed to alerts (DM).", ephemeral=True)
         return
     
     if action.value == "unsubscribe":
         if uid in subs:
-            subs.remove(uid)
-            state["alerts_subscribers"] = subs
-            await save_state()
-            await interaction.followup.send("✅ Unsubscribed from alerts.", ephemeral=True)
+            subs.discard(uid)
+            log_state_op({"op": "sub_del", "uid": uid})
+            await interaction.response.send_message("✅ Unsubscribed from alerts.", ephemeral=True)
             return
-        await interaction.followup.send("You were not subscribed.", ephemeral=True)
+        await interaction.response.send_message("You were not subscribed.", ephemeral=True)
         return
     
     if action.value == "list":
-        await interaction.followup.send(f"📊 Total subscribers: {len(subs)}", ephemeral=True)
+        await interaction.response.send_message(f"📊 Total subscribers: {len(subs)}", ephemeral=True)
         return
 
 # ==================== DASHBOARD ----------------
@@ -1666,16 +2347,24 @@ class IntervalModal(Modal):
     def __init__(self):
         super().__init__(title="Set Refresh Interval")
         self.input = TextInput(
-            label="Seconds", 
+            label="Seconds (empty = automatic)", 
             placeholder=str(DEFAULT_DASH_INTERVAL), 
-            required=True,
-            min_length=1,
+            required=False,
             max_length=5
         )
         self.add_item(self.input)
     
     async def on_submit(self, interaction: discord.Interaction):
         val = self.input.value.strip()
+        if not val:
+            # back to defaults: the monitor uses DEFAULT_DASH_INTERVAL, dash_loop follows battle activity
+            monitor.interval = DEFAULT_DASH_INTERVAL
+            if monitor_loop.is_running(): 
+                monitor_loop.change_interval(seconds=DEFAULT_DASH_INTERVAL)
+            state["dash_interval"] = None
+            log_state_op({"op": "set", "k": "dash_interval", "v": None})
+            await interaction.response.send_message("✅ Interval reset to automatic", ephemeral=True)
+            return
         try:
             sec = int(val)
             if sec < 5: 
@@ -1686,7 +2375,7 @@ class IntervalModal(Modal):
             if dash_loop.is_running(): 
                 dash_loop.change_interval(seconds=sec)
             state["dash_interval"] = sec
-            await save_state()
+            log_state_op({"op": "set", "k": "dash_interval", "v": sec})
             await interaction.response.send_message(f"✅ Interval set to {sec}s", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
@@ -1723,6 +2412,8 @@ class DashboardControls(View):
         await interaction.response.send_message("⏸️ Monitor stopped", ephemeral=True)
 
     async def on_refresh(self, interaction: discord.Interaction):
+        # a manual refresh should see current upstream data, not whatever is still cached
+        war_api.invalidate()
         alerts = await monitor.scan_once()
         await interaction.response.send_message(f"✅ Scanned: {len(alerts)} new alerts", ephemeral=True)
 
@@ -1732,77 +2423,186 @@ class DashboardControls(View):
     async def on_clear(self, interaction: discord.Interaction):
         monitor.alerts.clear()
         state["monitor_alerts"] = []
-        await save_state()
+        log_state_op({"op": "set", "k": "monitor_alerts", "v": []})
         await interaction.response.send_message("✅ Alerts cleared", ephemeral=True)
 
-@tree.command(name="dashboard", description="📊 Create/update live dashboard")
-async def dashboard_cmd(interaction: discord.Interaction):
-    await safe_defer(interaction)
+def _battle_field(b: Dict) -> Tuple[str, str, bool]:
+    a = b.get("attackerCountry") or b.get("attacker") or "?"
+    d = b.get("defenderCountry") or b.get("defender") or "?"
+    s = b.get("status") or b.get("phase") or "Active"
+    return (f"{a} vs {d}", safe_truncate(str(s), 50), False)
+
+def _price_val(kv: Tuple[str, Any]) -> float:
+    v = kv[1]
+    return v if isinstance(v, (int, float)) else 0.0
+
+# (payload, its items by price desc): war_api hands back the same cached object until it refetches
+_sorted_prices: Optional[Tuple[Dict, List[Tuple[str, Any]]]] = None
+
+def sorted_prices(prices: Dict) -> List[Tuple[str, Any]]:
+    """prices.items() highest first (non-numeric as 0), sorted once per distinct payload."""
+    global _sorted_prices
+    if _sorted_prices is None or _sorted_prices[0] is not prices:
+        _sorted_prices = (prices, sorted(prices.items(), key=_price_val, reverse=True))
+    return _sorted_prices[1]
+
+class DashState:
+    """Channel and message behind state["dash_message"], kept across dash_loop ticks."""
+    def __init__(self):
+        self.key: Optional[Tuple[int, int]] = None
+        self.channel = None
+        self.message: Optional[discord.PartialMessage] = None
+
+    def remember(self, channel, message: discord.Message):
+        self.key = (channel.id, message.id)
+        self.channel = channel
+        self.message = message
+
+    def invalidate(self):
+        self.key = self.channel = self.message = None
+
+    def get_channel(self):
+        dash = state.get("dash_message")
+        if not dash:
+            return None
+        key = (int(dash["channel_id"]), int(dash["message_id"]))
+        if key != self.key:
+            self.key, self.channel, self.message = key, None, None
+        if self.channel is None:
+            self.channel = bot.get_channel(key[0])
+        return self.channel
+
+    def can_post(self) -> bool:
+        """Whether the bot can currently edit or re-send the dashboard in its channel."""
+        ch = self.get_channel()
+        if ch is None:
+            return False
+        guild = getattr(ch, "guild", None)
+        if guild is None or guild.me is None:
+            return True
+        perms = ch.permissions_for(guild.me)
+        return perms.send_messages and perms.embed_links
+
+    def get_message(self) -> Optional[discord.PartialMessage]:
+        ch = self.get_channel()
+        if ch is None:
+            return None
+        if self.message is None:
+            # only edited, never read: a PartialMessage needs no fetch_message round-trip
+            self.message = ch.get_partial_message(self.key[1])
+        return self.message
+
+dash_state = DashState()
+
+async def post_dashboard(channel, embed: discord.Embed, view: View) -> discord.Message:
+    """Send a new dashboard message and make it the one dash_loop edits."""
+    posted = await channel.send(embed=embed, view=view)
+    state["dash_message"] = {"channel_id": channel.id, "message_id": posted.id}
+    log_state_op({"op": "set", "k": "dash_message", "v": state["dash_message"]})
+    dash_state.remember(channel, posted)
+    return posted
+
+DASH_RANK_PARAMS = {"rankingType": "userDamages"}
+DASH_STALE_NOTE = "(stale, upstream unavailable)"
+_dash_frame: Optional[Tuple[bytes, List[discord.Embed], DevJsonPages]] = None
+# battle count seen by the last build_dashboard_frame, drives the adaptive dash_loop interval
+_dash_active_battles = 0
+
+def dash_target_interval(active_battles: int) -> int:
+    if active_battles > DASH_BUSY_BATTLES:
+        return DASH_INTERVAL_BUSY
+    return DASH_INTERVAL_ACTIVE if active_battles else DASH_INTERVAL_IDLE
+
+async def build_dashboard_frame() -> Tuple[List[discord.Embed], DevJsonPages, bytes]:
+    """Dashboard pages, dev JSON and a digest of their inputs; rebuilt only when the inputs change."""
+    global _dash_frame, _dash_active_battles
+    ranking, prices, battles = await asyncio.gather(
+        war_api.call("ranking.getRanking", DASH_RANK_PARAMS),
+        war_api.call("itemTrading.getPrices"),
+        war_api.call("battle.getBattles"),
+        return_exceptions=True
+    )
+    ranking, prices, battles = [None if isinstance(r, BaseException) else r for r in (ranking, prices, battles)]
+    _dash_active_battles = len(coerce_items(battles))
+    recent_alerts = list(islice(monitor.alerts, 6))
+    stale = [
+        war_api.is_stale("ranking.getRanking", DASH_RANK_PARAMS),
+        war_api.is_stale("itemTrading.getPrices"),
+        war_api.is_stale("battle.getBattles"),
+    ]
+    digest = snapshot_digest([ranking, prices, battles, recent_alerts, stale])
+    if _dash_frame is not None and _dash_frame[0] == digest:
+        return _dash_frame[1], _dash_frame[2], digest
     
-    rank_pages, _ = await render_endpoint_to_pages("ranking.getRanking", {"rankingType": "userDamages"})
-    rank_embed = rank_pages[0] if rank_pages else discord.Embed(title="Rankings", timestamp=now_utc())
+    # the ranking payload is cached by war_api, so this re-render does not refetch it
+    try:
+        rank_pages, _ = await render_endpoint_to_pages("ranking.getRanking", DASH_RANK_PARAMS)
+    except Exception:
+        rank_pages = []
+    # one timestamp per refresh; locals for the helpers used in the field loops
+    _now = now_utc()
+    _trunc, _fmt, _Embed = safe_truncate, fmt_num, discord.Embed
     
-    prices = await war_api.call("itemTrading.getPrices")
-    pe = discord.Embed(title="💰 Item Prices", color=discord.Color.gold(), timestamp=now_utc())
+    rank_embed = rank_pages[0] if rank_pages else _Embed(title="Rankings", timestamp=_now)
+    
+    pe = _Embed(title="💰 Item Prices", color=discord.Color.gold(), timestamp=_now)
     if isinstance(prices, dict):
-        items = sorted(prices.items(), key=lambda x: float(x[1]) if isinstance(x[1], (int, float)) else 0, reverse=True)
-        for k, v in items[:12]:
-            pe.add_field(name=safe_truncate(str(k), 24), value=fmt_num(v), inline=True)
+        add_fields(pe, [(_trunc(str(k), 24), _fmt(v), True) for k, v in islice(sorted_prices(prices), 12)])
     
-    battles = await war_api.call("battle.getBattles")
-    be = discord.Embed(title="⚔️ Active Battles", color=discord.Color.red(), timestamp=now_utc())
+    be = _Embed(title="⚔️ Active Battles", color=discord.Color.red(), timestamp=_now)
     if isinstance(battles, list):
-        for b in battles[:8]:
-            if isinstance(b, dict):
-                a = b.get("attackerCountry") or b.get("attacker") or "?"
-                d = b.get("defenderCountry") or b.get("defender") or "?"
-                s = b.get("status") or b.get("phase") or "Active"
-                be.add_field(name=f"{a} vs {d}", value=safe_truncate(str(s), 50), inline=False)
-    
-    alerts_embed = discord.Embed(title="🚨 Recent Alerts", color=discord.Color.orange(), timestamp=now_utc())
-    recent_alerts = monitor.alerts[:6]
+        add_fields(be, [_battle_field(b) for b in islice(battles, 8) if isinstance(b, dict)])
+    
+    alerts_embed = _Embed(title="🚨 Recent Alerts", color=discord.Color.orange(), timestamp=_now)
     if recent_alerts:
-        for a in recent_alerts:
-            alerts_embed.add_field(
-                name=f"{a.get('level', '')} {a.get('category', '')}", 
-                value=safe_truncate(a.get("message", ""), 80), 
-                inline=False
-            )
+        add_fields(alerts_embed, [
+            (f"{a.get('level', '')} {a.get('category', '')}", _trunc(a.get("message", ""), 80), False)
+            for a in recent_alerts
+        ])
     else:
         alerts_embed.description = "No recent alerts"
 
-    game_pages = [rank_embed, pe, be, alerts_embed]
-    dev_pages = [
-        json.dumps({"endpoint": "ranking.getRanking"}), 
-        json.dumps(prices or {}, default=str), 
-        json.dumps(battles or {}, default=str), 
-        json.dumps(recent_alerts or {}, default=str)
-    ]
+    for emb, is_stale in zip((rank_embed, pe, be), stale):
+        if is_stale:
+            emb.set_footer(text=" • ".join(filter(None, (emb.footer.text, DASH_STALE_NOTE))))
+
+    pages = [rank_embed, pe, be, alerts_embed]
+    dev_pages = DevJsonPages([
+        {"endpoint": "ranking.getRanking"}, 
+        prices or {}, 
+        battles or {}, 
+        recent_alerts or {}
+    ])
+    _dash_frame = (digest, pages, dev_pages)
+    return pages, dev_pages, digest
+
+@tree.command(name="dashboard", description="📊 Create/update live dashboard")
+async def dashboard_cmd(interaction: discord.Interaction):
+    await safe_defer(interaction)
+    
+    game_pages, dev_pages, _ = await build_dashboard_frame()
     
     view = LeaderboardView(game_pages, dev_pages)
     controls = DashboardControls()
 
-    channel = bot.get_channel(int(DASH_CHANNEL_ID)) if DASH_CHANNEL_ID else interaction.channel
+    channel = bot.get_channel(DASH_CHANNEL_ID_INT) if DASH_CHANNEL_ID_INT else interaction.channel
     if channel is None:
         await interaction.followup.send("❌ Dashboard channel not configured. Set WARERA_DASH_CHANNEL.", ephemeral=True)
         return
     
     dash = state.get("dash_message")
+    # a stored message in another channel can never be edited from here, so don't try
+    msg = dash_state.get_message() if dash and int(dash["channel_id"]) == channel.id else None
     posted = None
-    
-    if dash:
+    if msg is not None:
         try:
-            msg = await channel.fetch_message(int(dash["message_id"]))
-            await msg.edit(embed=game_pages[0], view=view)
-            posted = msg
-        except Exception:
-            posted = await channel.send(embed=game_pages[0], view=view)
-            state["dash_message"] = {"channel_id": channel.id, "message_id": posted.id}
-            await save_state()
+            posted = await msg.edit(embed=game_pages[0], view=view)
+        except discord.NotFound:
+            pass
+    if posted is None:
+        await post_dashboard(channel, game_pages[0], view)
     else:
-        posted = await channel.send(embed=game_pages[0], view=view)
-        state["dash_message"] = {"channel_id": channel.id, "message_id": posted.id}
-        await save_state()
+        dash_state.remember(channel, posted)
     
     try:
         await interaction.followup.send("⚙️ Dashboard controls:", view=controls, ephemeral=True)
@@ -1810,129 +2610,152 @@ async def dashboard_cmd(interaction: discord.Interaction):
         pass
     
     if not dash_loop.is_running(): 
-        dash_loop.start()
+        start_dash_loop()
     
     await interaction.followup.send("✅ Dashboard created/updated!", ephemeral=True)
 
+# LeaderboardView times out after 300s, so an unchanged dashboard is still refreshed before then
+DASH_FORCE_EDIT_AFTER = 240.0
+_last_dash_sig: Optional[bytes] = None
+_last_dash_edit = 0.0
+
+def start_dash_loop():
+    if state.get("dash_interval"):
+        # pinned through IntervalModal (possibly before a restart); otherwise dash_loop adapts itself
+        dash_loop.change_interval(seconds=state["dash_interval"])
+    dash_loop.start()
+
 @tasks.loop(seconds=DEFAULT_DASH_INTERVAL)
 async def dash_loop():
+    global _last_dash_sig, _last_dash_edit
     dash = state.get("dash_message")
     if not dash: 
         return
+    # disconnected or missing permissions: any edit would fail, so skip the API calls too
+    if bot.is_closed() or not bot.is_ready():
+        return
     
     try:
-        ch = bot.get_channel(int(dash["channel_id"]))
-        if ch is None: 
+        ch = dash_state.get_channel()
+        if ch is None or not dash_state.can_post(): 
             return
-        msg = await ch.fetch_message(int(dash["message_id"]))
         
-        rank_pages, _ = await render_endpoint_to_pages("ranking.getRanking", {"rankingType": "userDamages"})
-        rank_embed = rank_pages[0] if rank_pages else discord.Embed(title="Rankings", timestamp=now_utc())
+        pages, dev_pages, sig = await build_dashboard_frame()
         
-        prices = await war_api.call("itemTrading.getPrices")
-        pe = discord.Embed(title="💰 Item Prices", color=discord.Color.gold(), timestamp=now_utc())
-        if isinstance(prices, dict):
-            items = sorted(prices.items(), key=lambda x: float(x[1]) if isinstance(x[1], (int, float)) else 0, reverse=True)
-            for k, v in items[:12]:
-                pe.add_field(name=safe_truncate(str(k), 24), value=fmt_num(v), inline=True)
+        if DASH_ADAPTIVE and state.get("dash_interval") is None:
+            target = dash_target_interval(_dash_active_battles)
+            if target != dash_loop.seconds:
+                log.info("[dash_loop] %d active battles, interval %ss -> %ss", _dash_active_battles, dash_loop.seconds, target)
+                dash_loop.change_interval(seconds=target)
         
-        battles = await war_api.call("battle.getBattles")
-        be = discord.Embed(title="⚔️ Active Battles", color=discord.Color.red(), timestamp=now_utc())
-        if isinstance(battles, list):
-            for b in battles[:8]:
-                if isinstance(b, dict):
-                    a = b.get("attackerCountry") or b.get("attacker") or "?"
-                    d = b.get("defenderCountry") or b.get("defender") or "?"
-                    s = b.get("status") or b.get("phase") or "Active"
-                    be.add_field(name=f"{a} vs {d}", value=safe_truncate(str(s), 50), inline=False)
-        
-        alerts_embed = discord.Embed(title="🚨 Recent Alerts", color=discord.Color.orange(), timestamp=now_utc())
-        recent_alerts = monitor.alerts[:6]
-        if recent_alerts:
-            for a in recent_alerts:
-                alerts_embed.add_field(
-                    name=f"{a.get('level', '')} {a.get('category', '')}", 
-                    value=safe_truncate(a.get("message", ""), 80), 
-                    inline=False
-                )
-        else:
-            alerts_embed.description = "No recent alerts"
-        
-        pages = [rank_embed, pe, be, alerts_embed]
-        dev_pages = [
-            json.dumps({"endpoint": "ranking"}), 
-            json.dumps(prices or {}, default=str), 
-            json.dumps(battles or {}, default=str), 
-            json.dumps(recent_alerts or {}, default=str)
-        ]
+        # skip the Discord edit when the inputs are unchanged, but re-send before the
+        # previous view times out so its buttons keep working
+        if sig == _last_dash_sig and time.monotonic() - _last_dash_edit < DASH_FORCE_EDIT_AFTER:
+            return
         
+        msg = dash_state.get_message()
         view = LeaderboardView(pages, dev_pages)
-        await msg.edit(embed=pages[0], view=view)
+        try:
+            dash_state.message = await msg.edit(embed=pages[0], view=view)
+        except discord.NotFound:
+            # dashboard message was deleted: post a fresh one in the same channel
+            await post_dashboard(ch, pages[0], view)
+        _last_dash_sig, _last_dash_edit = sig, time.monotonic()
+    except discord.HTTPException as e:
+        # message deleted or channel gone: drop the cached objects and re-resolve next tick
+        dash_state.invalidate()
+        log.error("[dash_loop] error: %s", e)
     except Exception as e:
-        print("[dash_loop] error:", e)
+        log.error("[dash_loop] error: %s", e)
 
 # ==================== BOT LIFECYCLE ----------------
 
 @bot.event
 async def on_ready():
-    print(f"✅ WarEra Bot logged in as {bot.user} (ID: {bot.user.id})")
-    print(f"📊 Serving {len(bot.guilds)} guild(s)")
+    log.info("✅ WarEra Bot logged in as %s (ID: %s)", bot.user, bot.user.id)
+    log.info("📊 Serving %d guild(s)", len(bot.guilds))
     
     try:
         synced = await tree.sync()
-        print(f"✅ Synced {len(synced)} slash command(s)")
+        log.info("✅ Synced %d slash command(s)", len(synced))
     except Exception as e:
-        print(f"❌ Failed to sync commands: {e}")
-    
-    monitor.prev = state.get("monitor_prev", {})
-    monitor.alerts = state.get("monitor_alerts", [])
+        log.error("❌ Failed to sync commands: %s", e)
     
+    # monitor.prev/alerts were loaded from state in Monitor.__init__; on_ready fires again on
+    # every non-resumed reconnect, and reloading here would replace live alerts with the snapshot
     if not monitor_loop.is_running(): 
         monitor_loop.start()
-        print("✅ Monitor loop started")
+        log.info("✅ Monitor loop started")
     
     if state.get("dash_message") and not dash_loop.is_running(): 
-        dash_loop.start()
-        print("✅ Dashboard loop started")
+        start_dash_loop()
+        log.info("✅ Dashboard loop started")
     
-    print("=" * 50)
-    print("🎮 WarEra Bot is ready!")
-    print("=" * 50)
+    log.info("🎮 WarEra Bot is ready!")
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    # drop cached channel objects so the loops stop posting into a deleted channel
+    global _alert_channel
+    if _alert_channel is not None and getattr(_alert_channel, "id", None) == channel.id:
+        _alert_channel = None
+    if dash_state.key and dash_state.key[0] == channel.id:
+        dash_state.invalidate()
 
 @bot.event
 async def on_error(event, *args, **kwargs):
-    print(f"❌ Error in {event}: {args} {kwargs}")
+    log.exception("❌ Error in %s: %s %s", event, args, kwargs)
 
 # ==================== MAIN ----------------
 
+async def run_bot():
+    """bot.run() without its own loop setup: start, and close (flushing state) on the way out."""
+    async with bot:
+        await bot.start(DISCORD_TOKEN)
+
 if __name__ == "__main__":
+    # logging first, so the banner goes through the same handler as everything after it
+    listener = setup_logging()
     if DISCORD_TOKEN == "YOUR_TOKEN_HERE":
-        print("=" * 50)
-        print("❌ ERROR: Discord bot token not configured!")
-        print("=" * 50)
-        print("Please set the DISCORD_BOT_TOKEN environment variable.")
-        print("Example: export DISCORD_BOT_TOKEN='your_token_here'")
-        print("=" * 50)
+        log.error("=" * 50)
+        log.error("❌ ERROR: Discord bot token not configured!")
+        log.error("=" * 50)
+        log.error("Please set the DISCORD_BOT_TOKEN environment variable.")
+        log.error("Example: export DISCORD_BOT_TOKEN='your_token_here'")
+        log.error("=" * 50)
+        listener.stop()
     else:
-        print("=" * 50)
-        print("🚀 Starting WarEra Discord Bot...")
-        print("=" * 50)
-        print(f"📍 API Base: {API_BASE}")
-        print(f"📁 State Path: {STATE_PATH}")
-        print(f"⏱️  Default Interval: {DEFAULT_DASH_INTERVAL}s")
-        print(f"📄 Page Size: {PAGE_SIZE}")
+        log.info("=" * 50)
+        log.info("🚀 Starting WarEra Discord Bot...")
+        log.info("=" * 50)
+        log.info("📍 API Base: %s", API_BASE)
+        log.info("📁 State Path: %s", STATE_PATH)
+        log.info("⏱️  Default Interval: %ss", DEFAULT_DASH_INTERVAL)
+        log.info("📄 Page Size: %s", PAGE_SIZE)
         if DASH_CHANNEL_ID:
-            print(f"📊 Dashboard Channel: {DASH_CHANNEL_ID}")
+            log.info("📊 Dashboard Channel: %s", DASH_CHANNEL_ID)
         if ALERT_CHANNEL_ID:
-            print(f"🚨 Alert Channel: {ALERT_CHANNEL_ID}")
-        print("=" * 50)
+            log.info("🚨 Alert Channel: %s", ALERT_CHANNEL_ID)
+        log.info("=" * 50)
         
         try:
-            bot.run(DISCORD_TOKEN)
+            if uvloop is not None and sys.version_info >= (3, 12):
+                # uvloop.install() and loop policies are deprecated here; hand the loop to a Runner
+                log.info("⚡ Using uvloop event loop")
+                with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                    runner.run(run_bot())
+            else:
+                if uvloop is not None:
+                    # bot.run() goes through asyncio.run(), which picks up the installed policy
+                    uvloop.install()
+                    log.info("⚡ Using uvloop event loop")
+                # discord.py's records propagate to the root queue handler
+                bot.run(DISCORD_TOKEN, log_handler=None)
         except KeyboardInterrupt:
-            print("\n👋 Bot shutdown requested")
+            log.info("👋 Bot shutdown requested")
         except Exception as e:
-            print(f"\n❌ Fatal error: {e}")
+            log.critical("❌ Fatal error: %s", e)
         finally:
-            print("✅ Bot stopped")
+            log.info("✅ Bot stopped")
+            listener.stop()
         